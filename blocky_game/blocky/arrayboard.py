@@ -0,0 +1,422 @@
+"""
+This file contains the ArrayBoard class, a compact alternative to the Block
+tree that stores a whole board in a few flat NumPy arrays.
+
+The board is stored as a complete quadtree in breadth-first order: the root
+is node 0, and the children of node i are nodes 4i + 1 to 4i + 4, in the same
+order as Block.children (upper-right, upper-left, lower-left, lower-right).
+Only nodes whose ancestors are all subdivided are part of the board; the
+entries of every other node are ignored.
+
+Because of this layout, the descendants of node i that are k levels below it
+occupy the contiguous slice [i * 4^k + (4^k - 1) / 3, ...) of length 4^k, so
+swapping and rotating a block only has to permute one slice per level.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import random
+
+import numpy as np
+
+from block import Block
+from settings import COLOUR_LIST
+
+# The colour index stored for nodes that are subdivided or unused.
+NO_COLOUR = 255
+
+# Child orderings produced by each action, where the new child at index j is
+# the old child at index ORDER[j].
+_SWAP_ORDER = {0: (1, 0, 3, 2), 1: (3, 2, 1, 0)}
+_ROTATE_ORDER = {1: (1, 2, 3, 0), 3: (3, 0, 1, 2)}
+
+_levels_cache: Dict[int, np.ndarray] = {}
+_permutation_cache: Dict[Tuple[int, Tuple[int, ...], bool], np.ndarray] = {}
+
+
+def _node_count(max_depth: int) -> int:
+    """Return the number of nodes in a complete quadtree with <max_depth>.
+
+    >>> _node_count(0)
+    1
+    >>> _node_count(2)
+    21
+    """
+    return (4 ** (max_depth + 1) - 1) // 3
+
+
+def _levels(max_depth: int) -> np.ndarray:
+    """Return a read-only array holding the level of every node in a complete
+    quadtree with <max_depth>.
+
+    The array is shared between all ArrayBoards with the same <max_depth>.
+    """
+    if max_depth not in _levels_cache:
+        levels = np.empty(_node_count(max_depth), dtype=np.uint8)
+        for level in range(max_depth + 1):
+            start = _node_count(level - 1) if level > 0 else 0
+            levels[start:_node_count(level)] = level
+        levels.setflags(write=False)
+        _levels_cache[max_depth] = levels
+    return _levels_cache[max_depth]
+
+
+def _descendants(index: int, depth: int) -> slice:
+    """Return the slice of the nodes that are <depth> levels below the node at
+    <index>.
+    """
+    width = 4 ** depth
+    start = index * width + (width - 1) // 3
+    return slice(start, start + width)
+
+
+def _permutation(depth: int, order: Tuple[int, ...],
+                 recursive: bool) -> np.ndarray:
+    """Return the gather indices that reorder the 4^<depth> descendants of a
+    node when its children are reordered by <order>.
+
+    If <recursive> is True, the children of every descendant are reordered by
+    <order> as well, as rotate does. Otherwise only the outermost children
+    move, as swap does.
+    """
+    key = (depth, order, recursive)
+    if key not in _permutation_cache:
+        positions = np.arange(4 ** depth)
+        mapped = np.array(order)
+        result = np.zeros(4 ** depth, dtype=np.intp)
+        for digit in range(depth):
+            weight = 4 ** digit
+            value = (positions // weight) % 4
+            if recursive or digit == depth - 1:
+                value = mapped[value]
+            result += value * weight
+        _permutation_cache[key] = result
+    return _permutation_cache[key]
+
+
+class ArrayBoard:
+    """A Blocky board stored as flat arrays instead of a tree of Blocks.
+
+    Blocks are referred to by their node index (see the module docstring).
+    The root block is node 0.
+
+    === Public Attributes ===
+    max_depth:
+        The deepest level allowed in the board.
+    size:
+        The height and width of the board, in pixels.
+    position:
+        The (x, y) coordinates of the upper left corner of the board.
+    structure:
+        structure[i] is 1 if node i is subdivided, and 0 otherwise.
+    colours:
+        colours[i] is the index into COLOUR_LIST of the colour of node i if it
+        is not subdivided, and NO_COLOUR otherwise.
+    levels:
+        levels[i] is the level of node i. This array is read-only and shared.
+
+    === Representation Invariants ===
+    - len(structure) == len(colours) == len(levels)
+                     == (4 ** (max_depth + 1) - 1) // 3
+    - structure[i] == 0 for every node i at level max_depth
+    - colours[i] != NO_COLOUR for every node i in the board with
+      structure[i] == 0
+    """
+    max_depth: int
+    size: int
+    position: Tuple[int, int]
+    structure: np.ndarray
+    colours: np.ndarray
+    levels: np.ndarray
+
+    def __init__(self, max_depth: int, size: int,
+                 colour: Tuple[int, int, int],
+                 position: Tuple[int, int] = (0, 0)) -> None:
+        """Initialize this board as a single undivided block of <colour>, with
+        a depth of <max_depth> and dimensions of <size> by <size>.
+
+        Precondition:
+            - colour in COLOUR_LIST
+        """
+        self.max_depth = max_depth
+        self.size = size
+        self.position = position
+        count = _node_count(max_depth)
+        self.structure = np.zeros(count, dtype=np.uint8)
+        self.colours = np.full(count, NO_COLOUR, dtype=np.uint8)
+        self.colours[0] = COLOUR_LIST.index(colour)
+        self.levels = _levels(max_depth)
+
+    def __eq__(self, other: ArrayBoard) -> bool:
+        """Return True iff this board and <other> describe the same blocks.
+
+        Entries for nodes that are not part of either board are ignored.
+        """
+        if self.max_depth != other.max_depth or self.size != other.size or \
+                self.position != other.position:
+            return False
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            if self.structure[index] != other.structure[index]:
+                return False
+            if self.structure[index]:
+                pending.extend(range(4 * index + 1, 4 * index + 5))
+            elif self.colours[index] != other.colours[index]:
+                return False
+        return True
+
+    @staticmethod
+    def index_of(path: Sequence[int]) -> int:
+        """Return the node index of the block reached by following <path>, a
+        sequence of child indices, from the root.
+
+        >>> ArrayBoard.index_of(())
+        0
+        >>> ArrayBoard.index_of((1, 3))
+        12
+        """
+        index = 0
+        for child in path:
+            index = 4 * index + 1 + child
+        return index
+
+    @staticmethod
+    def path_of(index: int) -> Tuple[int, ...]:
+        """Return the path of child indices from the root to node <index>.
+
+        >>> ArrayBoard.path_of(12)
+        (1, 3)
+        """
+        path = []
+        while index > 0:
+            path.append((index - 1) % 4)
+            index = (index - 1) // 4
+        return tuple(reversed(path))
+
+    def is_leaf(self, index: int) -> bool:
+        """Return True iff the block at node <index> is not subdivided.
+        """
+        return not self.structure[index]
+
+    def colour(self, index: int) -> Optional[Tuple[int, int, int]]:
+        """Return the colour of the block at node <index>, or None if it is
+        subdivided.
+        """
+        if self.structure[index]:
+            return None
+        return COLOUR_LIST[self.colours[index]]
+
+    def children(self, index: int) -> List[int]:
+        """Return the node indices of the children of the block at node
+        <index>, or an empty list if it is not subdivided.
+        """
+        if not self.structure[index]:
+            return []
+        return list(range(4 * index + 1, 4 * index + 5))
+
+    def leaves(self) -> List[int]:
+        """Return the node indices of all undivided blocks in this board.
+        """
+        result = []
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            if self.structure[index]:
+                pending.extend(range(4 * index + 4, 4 * index, -1))
+            else:
+                result.append(index)
+        return result
+
+    def smashable(self, index: int) -> bool:
+        """Return True iff the block at node <index> can be smashed.
+        """
+        return self.levels[index] != self.max_depth and \
+            not self.structure[index]
+
+    def smash(self, index: int) -> bool:
+        """Sub-divide the block at node <index> into four randomly generated
+        children.
+
+        Random numbers are drawn in the same order as Block.smash, so both
+        produce the same board from the same random seed.
+
+        Return True iff the smash was performed.
+        """
+        if not self.smashable(index):
+            return False
+        first = 4 * index + 1
+        self.structure[index] = 1
+        self.colours[index] = NO_COLOUR
+        for child in range(first, first + 4):
+            self.structure[child] = 0
+            self.colours[child] = random.randint(0, len(COLOUR_LIST) - 1)
+        for child in range(first, first + 4):
+            if random.random() < math.exp(-0.25 * int(self.levels[child])):
+                self.smash(child)
+        return True
+
+    def _reorder(self, index: int, order: Tuple[int, ...],
+                 recursive: bool) -> None:
+        """Reorder the descendants of the block at node <index> so that its
+        new child j is its old child order[j].
+
+        If <recursive> is True, apply the same reordering at every level.
+        """
+        for depth in range(1, self.max_depth - int(self.levels[index]) + 1):
+            where = _descendants(index, depth)
+            gather = _permutation(depth, order, recursive)
+            self.structure[where] = self.structure[where][gather]
+            self.colours[where] = self.colours[where][gather]
+
+    def swap(self, index: int, direction: int) -> bool:
+        """Swap the children of the block at node <index>.
+
+        If <direction> is 1, swap vertically. If <direction> is 0, swap
+        horizontally.
+
+        Return True iff the swap was performed.
+
+        Precondition: <direction> is either 0 or 1
+        """
+        if not self.structure[index]:
+            return False
+        self._reorder(index, _SWAP_ORDER[direction], False)
+        return True
+
+    def rotate(self, index: int, direction: int) -> bool:
+        """Rotate the block at node <index> and all its descendants.
+
+        If <direction> is 1, rotate clockwise. If <direction> is 3, rotate
+        counter-clockwise.
+
+        Return True iff the rotate was performed.
+
+        Precondition: <direction> is either 1 or 3.
+        """
+        if not self.structure[index]:
+            return False
+        self._reorder(index, _ROTATE_ORDER[direction], True)
+        return True
+
+    def paint(self, index: int, colour: Tuple[int, int, int]) -> bool:
+        """Change the colour of the block at node <index> iff it is at a level
+        of max_depth and its colour is different from <colour>.
+
+        Return True iff the colour was changed.
+        """
+        if colour not in COLOUR_LIST or self.levels[index] != self.max_depth:
+            return False
+        colour_index = COLOUR_LIST.index(colour)
+        if self.colours[index] == colour_index:
+            return False
+        self.colours[index] = colour_index
+        return True
+
+    def combine(self, index: int) -> bool:
+        """Turn the block at node <index> into a leaf based on the majority
+        colour of its children, following the same rules as Block.combine.
+
+        Return True iff the block was turned into a leaf.
+        """
+        if not self.structure[index] or \
+                self.levels[index] != self.max_depth - 1:
+            return False
+        counts = np.bincount(self.colours[4 * index + 1:4 * index + 5],
+                             minlength=len(COLOUR_LIST))
+        majority = int(np.argmax(counts))
+        if counts[majority] < 2 or \
+                (counts[majority] == 2 and np.count_nonzero(counts) == 2):
+            return False
+        self.structure[index] = 0
+        self.colours[index] = majority
+        return True
+
+    def create_copy(self) -> ArrayBoard:
+        """Return a new ArrayBoard that is a deep copy of this board.
+        """
+        copy = ArrayBoard.__new__(ArrayBoard)
+        copy.max_depth = self.max_depth
+        copy.size = self.size
+        copy.position = self.position
+        copy.structure = self.structure.copy()
+        copy.colours = self.colours.copy()
+        copy.levels = self.levels
+        return copy
+
+    @staticmethod
+    def from_block(block: Block) -> ArrayBoard:
+        """Return a new ArrayBoard describing the same board as <block>.
+
+        Precondition: <block> is the root of its board (its level is 0).
+        """
+        board = ArrayBoard.__new__(ArrayBoard)
+        board.max_depth = block.max_depth
+        board.size = block.size
+        board.position = block.position
+        count = _node_count(block.max_depth)
+        board.structure = np.zeros(count, dtype=np.uint8)
+        board.colours = np.full(count, NO_COLOUR, dtype=np.uint8)
+        board.levels = _levels(block.max_depth)
+
+        pending = [(block, 0)]
+        while pending:
+            node, index = pending.pop()
+            if node.children:
+                board.structure[index] = 1
+                for i in range(4):
+                    pending.append((node.children[i], 4 * index + 1 + i))
+            else:
+                board.colours[index] = COLOUR_LIST.index(node.colour)
+        return board
+
+    def to_block(self) -> Block:
+        """Return a new Block tree describing the same board as this one.
+        """
+        return self._build_block(0, self.position, self.size)
+
+    def _build_block(self, index: int, position: Tuple[int, int],
+                     size: int) -> Block:
+        """Return a new Block for node <index> and its descendants, with the
+        given <position> and <size>.
+        """
+        block = Block(position, size, self.colour(index),
+                      int(self.levels[index]), self.max_depth)
+        if self.structure[index]:
+            # Children are laid out exactly as in Block._children_positions.
+            half = round(size / 2.0)
+            x, y = position
+            positions = [(x + half, y), (x, y), (x, y + half),
+                         (x + half, y + half)]
+            for i in range(4):
+                block.children.append(
+                    self._build_block(4 * index + 1 + i, positions[i], half))
+        return block
+
+
+def generate_array_board(max_depth: int, size: int) -> ArrayBoard:
+    """Return a new randomly generated ArrayBoard with a depth of <max_depth>
+    and dimensions of <size> by <size>.
+
+    Random numbers are drawn in the same order as block.generate_board.
+
+    >>> board = generate_array_board(3, 750)
+    >>> board.max_depth
+    3
+    >>> board.is_leaf(0)
+    False
+    """
+    board = ArrayBoard(max_depth, size, random.choice(COLOUR_LIST))
+    board.smash(0)
+    return board
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'math',
+            'numpy', 'block', 'settings'
+        ],
+        'max-attributes': 15
+    })
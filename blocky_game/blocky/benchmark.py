@@ -0,0 +1,259 @@
+"""
+This file contains a benchmark suite for the Blocky game. It times board
+generation, the Block operations, goal scoring and the SmartPlayer on boards
+of every max_depth from 2 to 8, each generated from a fixed seed. It also
+times scoring every candidate move with and without a transposition table,
+so that the table is only used where it pays for its hashing.
+
+Results can be saved as a JSON baseline, and a later run can be compared
+against that baseline to find operations that became slower.
+
+Run it from the command line, for example:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.2
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from block import Block, block_at, generate_board
+from goal import BlobGoal, Goal, PerimeterGoal, _flatten
+from player import SmartPlayer, _get_block, legal_moves
+from settings import BOARD_SIZE, COLOUR_LIST
+from transposition import TranspositionTable
+
+
+def _time(setup: Callable[[], Any], operation: Callable[[Any], Any],
+          repeat: int) -> List[float]:
+    """Return the number of seconds taken by each of <repeat> calls to
+    <operation>(<setup>()), not counting the time spent in <setup>.
+
+    The random number generator is reseeded before each call, so operations
+    that draw random numbers do the same work every time.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup()
+        random.seed(0)
+        start = time.perf_counter()
+        operation(argument)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _board(max_depth: int) -> Block:
+    """Return the benchmark board for <max_depth>, which is the same on every
+    run.
+    """
+    random.seed(max_depth)
+    return generate_board(max_depth, BOARD_SIZE)
+
+
+def _find(board: Block, condition: Callable[[Block], bool]) -> Optional[Block]:
+    """Return the first block of <board>, in preorder, that satisfies
+    <condition>, or None if there is none.
+    """
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if condition(block):
+            return block
+        stack.extend(reversed(block.children))
+    return None
+
+
+def _combinable_copy(board: Block) -> Block:
+    """Return a copy of <board> in which some block can be combined.
+
+    If no block can be combined, the children of the first block at level
+    max_depth - 1 are recoloured so that it can be.
+    """
+    copy = board.create_copy()
+    if _find(copy, Block.combinable) is None:
+        block = _find(copy, lambda b: b.level == b.max_depth - 1 and
+                      bool(b.children))
+        if block is None:
+            block = _find(copy, Block.smashable)
+            while block.level < block.max_depth - 1:
+                block.smash()
+                block = _find(block, Block.smashable)
+            block.smash()
+        for child in block.children:
+            child.colour = COLOUR_LIST[0]
+    return copy
+
+
+def _points(board: Block) -> List[tuple]:
+    """Return a fixed set of locations on <board> to look blocks up at.
+    """
+    step = board.size // 7
+    return [(x, y) for x in range(0, board.size, step)
+            for y in range(0, board.size, step)]
+
+
+def _score_moves(goal: Goal, key: Optional[Callable[[Block], int]]) -> \
+        Callable[[Block], None]:
+    """Return an operation that scores <goal> after each legal move on a
+    board, undoing each move in turn, as SmartPlayer does.
+
+    If <key> is not None, each position is looked up in a TranspositionTable
+    under <key>(board) first, and only scored if it is not found.
+    """
+    def operation(board: Block) -> None:
+        table = TranspositionTable()
+        for action, path in list(legal_moves(board, goal.colour)):
+            block = block_at(board, path)
+            record = block.apply(action, goal.colour)
+            if key is None:
+                goal.score(board)
+            elif table.get(key(board)) is None:
+                table.put(key(board), goal.score(board))
+            block.undo(record)
+    return operation
+
+
+def _operations(board: Block) -> Dict[str, tuple]:
+    """Return the benchmarked operations on <board>, as a mapping from each
+    operation's name to its setup and operation functions.
+
+    Every setup returns a fresh copy of <board> (or a block within one), so
+    no operation sees values cached by an earlier call.
+    """
+    copy = board.create_copy
+    perimeter = PerimeterGoal(COLOUR_LIST[0])
+    blob = BlobGoal(COLOUR_LIST[0])
+    points = _points(board)
+
+    def smart_move(b: Block) -> None:
+        player = SmartPlayer(0, blob, 20)
+        player.process_event(('proceed', None))
+        player.generate_move(b)
+
+    return {
+        'generate_board': (lambda: board.max_depth,
+                           lambda depth: generate_board(depth, BOARD_SIZE)),
+        'create_copy': (lambda: board, Block.create_copy),
+        'rotate': (copy, lambda b: b.rotate(1)),
+        'swap': (copy, lambda b: b.swap(0)),
+        'smash': (lambda: _find(copy(), Block.smashable), Block.smash),
+        'combine': (lambda: _find(_combinable_copy(board), Block.combinable),
+                    Block.combine),
+        '_flatten': (copy, _flatten),
+        'PerimeterGoal.score': (copy, perimeter.score),
+        'BlobGoal.score': (copy, blob.score),
+        '_get_block': (copy, lambda b: [_get_block(b, point, b.max_depth)
+                                        for point in points]),
+        'SmartPlayer.generate_move': (copy, smart_move),
+        'blob_moves': (copy, _score_moves(blob, None)),
+        'blob_moves_hash': (copy, _score_moves(blob, Block.structure_hash)),
+        'blob_moves_canonical': (copy,
+                                 _score_moves(blob, Block.canonical_key)),
+        'perimeter_moves': (copy, _score_moves(perimeter, None)),
+        'perimeter_moves_hash': (copy, _score_moves(perimeter,
+                                                    Block.structure_hash)),
+        'perimeter_moves_canonical': (copy, _score_moves(
+            perimeter, Block.canonical_key))
+    }
+
+
+def run_benchmarks(depths: List[int], repeat: int,
+                   names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the benchmarks named in <names>, or all of them if <names> is None,
+    at each max_depth in <depths>, <repeat> times each.
+
+    Return the results as a JSON-compatible dictionary. Each result is keyed
+    by '<operation>@<depth>', and holds the median and minimum time of one
+    call in seconds.
+    """
+    results = {}
+    for depth in depths:
+        board = _board(depth)
+        for name, (setup, operation) in _operations(board).items():
+            if names is not None and name not in names:
+                continue
+            times = _time(setup, operation, repeat)
+            results[f'{name}@{depth}'] = {
+                'median': statistics.median(times),
+                'min': min(times)
+            }
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float) -> List[str]:
+    """Return a description of every result in <current> whose median time
+    is more than <threshold> (a fraction, such as 0.2 for 20%) slower than in
+    <baseline>.
+    """
+    regressions = []
+    for key, result in current['results'].items():
+        if key not in baseline['results']:
+            continue
+        before = baseline['results'][key]['median']
+        after = result['median']
+        if before > 0 and after > before * (1 + threshold):
+            regressions.append(f'{key}: {before * 1000:.3f}ms -> '
+                               f'{after * 1000:.3f}ms '
+                               f'({after / before - 1:+.0%})')
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    """Run the benchmarks configured by the command-line arguments <argv>.
+
+    Return the exit status: 1 if a comparison found a regression, and 0
+    otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description='Time Blocky board operations, scoring and AI moves.')
+    parser.add_argument('--depths', type=int, nargs=2, default=[2, 8],
+                        metavar=('MIN', 'MAX'),
+                        help='range of board depths to benchmark')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed calls of each operation')
+    parser.add_argument('--only', nargs='*',
+                        help='names of the operations to benchmark')
+    parser.add_argument('--output', metavar='PATH',
+                        help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results with a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown that counts as a regression')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(list(range(args.depths[0], args.depths[1] + 1)),
+                            args.repeat, args.only)
+    for key, result in report['results'].items():
+        print(f"{key:<32}{result['median'] * 1000:>10.3f}ms"
+              f"{result['min'] * 1000:>10.3f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, report, args.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            return 1
+        print('No regressions beyond', f'{args.threshold:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,106 @@
 This file contains the Block class, the main data structure used in the game.
 """
 from __future__ import annotations
-from typing import Optional, Tuple, List
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, List
 import random
 import math
 
 from settings import colour_name, COLOUR_LIST
 
+# A record of a move performed by Block.apply, as a tuple of the action's name,
+# its direction (or None), and whatever Block.undo needs to restore the
+# previous state of the Block.
+UndoRecord = Tuple[str, Optional[int], Any]
+
+# Block hashes are 64-bit unsigned integers.
+_MASK = (1 << 64) - 1
+
+
+def _mix(value: int) -> int:
+    """Return a well-scrambled 64-bit hash of <value>, using the finalizer of
+    the SplitMix64 generator.
+
+    Unlike hash(), this gives the same result in every process.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+def _leaf_hash(colour: Tuple[int, int, int], level: int,
+               max_depth: int) -> int:
+    """Return the hash of a leaf with <colour> at <level> of a board with
+    <max_depth>.
+    """
+    # A leaf should always have a colour, but compare colourless leaves
+    # without failing.
+    red, green, blue = colour or (0, 0, 0)
+    return _mix((max_depth << 40) | (level << 32) | (1 << 24) |
+                (red << 16) | (green << 8) | blue)
+
+
+# The eight symmetries of the square, as permutations of child indices. Under
+# symmetry t, the child at index j is the image of the child at index
+# _SYMMETRIES[t][j], itself transformed by t. Symmetries 0 to 3 are clockwise
+# rotations by that many quarter turns. Symmetries 4 to 7 are the same
+# rotations applied after a mirror image across the vertical axis.
+_SYMMETRIES = tuple(tuple((j + turns) % 4 for j in range(4))
+                    for turns in range(4)) + \
+    tuple(tuple((1, 0, 3, 2)[(j + turns) % 4] for j in range(4))
+          for turns in range(4))
+
+
+def _node_hash(child_hashes: Sequence[int], level: int, max_depth: int) -> int:
+    """Return the hash of a subdivided block at <level> of a board with
+    <max_depth>, whose children have <child_hashes> in order.
+    """
+    value = _mix((max_depth << 40) | (level << 32))
+    for child_hash in child_hashes:
+        value = _mix(value ^ child_hash)
+    return value
+
+
+def block_at(board: Block, path: Sequence[int]) -> Block:
+    """Return the Block reached from <board> by following <path>, a sequence
+    of child indices.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    >>> block_at(board, ()) is board
+    True
+
+    Precondition: <path> leads to a Block within <board>.
+    """
+    block = board
+    for index in path:
+        block = block.children[index]
+    return block
+
+
+def path_to(board: Block, block: Block) -> Tuple[int, ...]:
+    """Return the path from <board> to <block>, so that
+    block_at(board, path_to(board, block)) is block.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[0], 0, 1)
+    >>> board.smash()
+    True
+    >>> path_to(board, board.children[2])
+    (2,)
+
+    Precondition: <block> is <board> or one of its descendants.
+    """
+    path = []
+    current = board
+    x, y = block.position
+    while current.level < block.level:
+        for index, child in enumerate(current.children):
+            if child.position[0] <= x < child.position[0] + child.size and \
+                    child.position[1] <= y < child.position[1] + child.size:
+                path.append(index)
+                current = child
+                break
+    return tuple(path)
+
 
 def generate_board(max_depth: int, size: int) -> Block:
     """Return a new game board with a depth of <max_depth> and dimensions of
@@ -72,12 +166,23 @@ class Block:
         - its colour is not None.
     - level <= max_depth
     """
+    # === Private Attributes ===
+    # _parent:
+    #   The Block that has this Block as a child, or None if this Block is the
+    #   root. It is set when the parent first caches a value, so that mutating
+    #   this Block can invalidate every ancestor that depends on it.
+    # _cache:
+    #   Values computed from this Block and its descendants by cached(), keyed
+    #   by name. It is cleared whenever this Block or a descendant is mutated
+    #   through one of the methods below.
     position: Tuple[int, int]
     size: int
     colour: Optional[Tuple[int, int, int]]
     level: int
     max_depth: int
     children: List[Block]
+    _parent: Optional[Block]
+    _cache: Dict[str, Any]
 
     def __init__(self, position: Tuple[int, int], size: int,
                  colour: Optional[Tuple[int, int, int]], level: int,
@@ -97,6 +202,8 @@ class Block:
         self.level = level
         self.max_depth = max_depth
         self.children = []
+        self._parent = None
+        self._cache = {}
 
     def __str__(self) -> str:
         """Return this Block in a string format.
@@ -105,25 +212,34 @@ class Block:
         >>> str(block)
         'Leaf: colour=Black, pos=(0, 0), size=750, level=0\\n'
         """
+        lines = []
+        self._str_lines(lines)
+        return ''.join(lines)
+
+    def _str_lines(self, lines: List[str]) -> None:
+        """Append the lines of str(self) to <lines>, so that the string is
+        built in a single join rather than by repeated concatenation.
+        """
+        indents = '\t' * self.level
         if len(self.children) == 0:
-            indents = '\t' * self.level
             colour = colour_name(self.colour)
-            return f'{indents}Leaf: colour={colour}, pos={self.position}, ' \
-                   f'size={self.size}, level={self.level}\n'
+            lines.append(f'{indents}Leaf: colour={colour}, '
+                         f'pos={self.position}, size={self.size}, '
+                         f'level={self.level}\n')
         else:
-            indents = '\t' * self.level
-            result = f'{indents}Parent: pos={self.position},' \
-                     f'size={self.size}, level={self.level}\n'
-
+            lines.append(f'{indents}Parent: pos={self.position},'
+                         f'size={self.size}, level={self.level}\n')
             for child in self.children:
-                result += str(child)
-
-            return result
+                child._str_lines(lines)
 
     def __eq__(self, other: Block) -> bool:
         """Return True iff this Block and all its descendents are equivalent to
         the <other> Block and all its descendents.
         """
+        if self.structure_hash() != other.structure_hash():
+            # Blocks that differ in colour, structure or level never share a
+            # hash, so there is no need to walk the trees.
+            return False
         if len(self.children) == 0 and len(other.children) == 0:
             # Both self and other are leaves.
             return self.position == other.position and \
@@ -143,6 +259,75 @@ class Block:
 
             return True
 
+    def cached(self, key: str, compute: Callable[[Block], Any]) -> Any:
+        """Return <compute>(self), reusing the value stored under <key> if it
+        was already computed since this Block or one of its descendants was
+        last mutated.
+
+        <compute> may call cached() on this Block's children, in which case the
+        values of untouched subtrees are reused after a mutation.
+        """
+        if key not in self._cache:
+            for child in self.children:
+                child._parent = self
+            self._cache[key] = compute(self)
+        return self._cache[key]
+
+    def structure_hash(self) -> int:
+        """Return a 64-bit hash of this Block's colours, structure, level and
+        max_depth.
+
+        Equal Blocks always have the same hash. The hash is cached, so after a
+        mutation only the hashes of the changed Block and its ancestors are
+        recomputed; untouched subtrees keep theirs.
+        """
+        if not self.children:
+            return _leaf_hash(self.colour, self.level, self.max_depth)
+        return self.cached('hash', lambda block: _node_hash(
+            [child.structure_hash() for child in block.children],
+            block.level, block.max_depth))
+
+    def symmetry_hashes(self) -> Tuple[int, ...]:
+        """Return the structure_hash() of each of the eight images of this
+        Block under the rotations and reflections of the square, without
+        building them.
+
+        The first hash is always structure_hash() itself. Like that hash,
+        these are cached and only recomputed along the path of a mutation.
+        """
+        if not self.children:
+            return (self.structure_hash(),) * 8
+        return self.cached('symmetry', Block._symmetry_hashes)
+
+    def _symmetry_hashes(self) -> Tuple[int, ...]:
+        """Compute symmetry_hashes() for this Block, which has children.
+        """
+        child_hashes = [child.symmetry_hashes() for child in self.children]
+        return tuple(_node_hash([child_hashes[index][t]
+                                 for index in _SYMMETRIES[t]],
+                                self.level, self.max_depth)
+                     for t in range(8))
+
+    def canonical_key(self) -> int:
+        """Return a key that is the same for this Block and for every rotation
+        or mirror image of it, and different (barring hash collisions) for
+        any other Block.
+
+        Goal scores do not change under these symmetries, so this key can be
+        used to share cached scores between all eight variants of a board.
+        """
+        return min(self.symmetry_hashes())
+
+    def _changed(self) -> None:
+        """Discard the cached values of this Block and of all its ancestors,
+        after this Block or one of its descendants was mutated.
+        """
+        block = self
+        while block is not None:
+            if block._cache:
+                block._cache.clear()
+            block = block._parent
+
     def _child_size(self) -> int:
         """Return the size of this Block's children.
         """
@@ -217,6 +402,7 @@ class Block:
                 self.children.append(block)
                 if random.random() < math.exp(-0.25 * block.level):
                     block.smash()
+            self._changed()
             return True
         return False
 
@@ -248,6 +434,7 @@ class Block:
 
             for child in self.children:
                 child._update_children_positions(child.position)
+            self._changed()
             return True
         else:
             # Horizontal swap (along the y-axis)
@@ -264,6 +451,7 @@ class Block:
 
             for child in self.children:
                 child._update_children_positions(child.position)
+            self._changed()
             return True
 
     def rotate(self, direction: int) -> bool:
@@ -278,6 +466,21 @@ class Block:
         """
         if not self.children:
             return False
+        self._rotate(direction)
+        self._changed()
+        return True
+
+    def _rotate(self, direction: int) -> None:
+        """Rotate this Block and all its descendants, discarding their cached
+        values but not those of this Block's ancestors.
+
+        If this Block has no children, do nothing.
+
+        Precondition: <direction> is either 1 or 3.
+        """
+        if not self.children:
+            return
+        self._cache.clear()
         if direction == 1:
             # Rotate clockwise
             positions = []
@@ -293,8 +496,7 @@ class Block:
 
             for child in self.children:
                 child._update_children_positions(child.position)
-                child.rotate(direction)
-            return True
+                child._rotate(direction)
         else:
             # Rotate counter-clockwise
             positions = []
@@ -310,8 +512,7 @@ class Block:
 
             for child in self.children:
                 child._update_children_positions(child.position)
-                child.rotate(direction)
-            return True
+                child._rotate(direction)
 
     def paint(self, colour: Tuple[int, int, int]) -> bool:
         """Change this Block's colour iff it is a leaf at a level of max_depth
@@ -324,6 +525,7 @@ class Block:
             if self.level == self.max_depth and self.colour != colour:
                 # Update the colour of the block
                 self.colour = colour
+                self._changed()
                 return True
         # If colour isn't in COLOUR_LIST
         return False
@@ -341,10 +543,30 @@ class Block:
 
         Return True iff this Block was turned into a leaf node.
         """
+        if not self.combinable():
+            return False
+        self.colour = self._majority_colour()
+        self.children = []
+        self._changed()
+        return True
+
+    def combinable(self) -> bool:
+        """Return True iff this block can be combined.
+
+        A block can be combined if it has children, its level is
+        max_depth - 1, and its children have a majority colour.
+        """
         # If there are no children or level of block is not <max_depth - 1>
         if not self.children or self.level != (self.max_depth - 1):
             return False
+        return self._majority_colour() is not None
+
+    def _majority_colour(self) -> Optional[Tuple[int, int, int]]:
+        """Return the majority colour of this Block's children, or None if
+        there is no majority colour.
 
+        Precondition: this Block has children.
+        """
         # Populate a dictionary of the total occurrences the types of colours
         # on the same <level>.
         colour_frequency = {}
@@ -363,20 +585,69 @@ class Block:
             if value == max_frequency:
                 colour = key
 
-        if max_frequency == 2:
-            if len(colour_frequency) == 2:
-                return False
-            else:
-                self.colour = colour
-                self.children = []
-                return True
-        # Check if the biggest value in colour_frequency is a 3 or 4.
-        if max_frequency >= 3:
-            # Update all of the colours of the children to the majority colour
-            self.colour = colour
+        # Two pairs of colours is a tie, and a single colour is never a
+        # majority.
+        if max_frequency >= 3 or \
+                (max_frequency == 2 and len(colour_frequency) == 3):
+            return colour
+        return None
+
+    def apply(self, action: Tuple[str, Optional[int]],
+              colour: Optional[Tuple[int, int, int]] = None) \
+            -> Optional[UndoRecord]:
+        """Perform <action> on this Block and return a record that undo() can
+        use to restore this Block's exact previous state, or None if the action
+        could not be performed.
+
+        <action> is one of the actions in actions.py, such as ('rotate', 1).
+        <colour> is the colour to paint with, if <action> is a paint.
+
+        The record only holds what the action changed, so its size depends on
+        the size of the change and not on the size of the board.
+        """
+        name, direction = action
+        saved = None
+        if name == 'rotate':
+            performed = self.rotate(direction)
+        elif name == 'swap':
+            performed = self.swap(direction)
+        elif name == 'smash':
+            saved = self.colour
+            performed = self.smash()
+        elif name == 'paint':
+            saved = self.colour
+            performed = self.paint(colour)
+        elif name == 'combine':
+            saved = self.children
+            performed = self.combine()
+        else:
+            performed = name == 'pass'
+
+        if not performed:
+            return None
+        return name, direction, saved
+
+    def undo(self, record: UndoRecord) -> None:
+        """Restore the state this Block was in before the move that returned
+        <record> was applied to it.
+
+        Precondition: <record> was returned by self.apply, and every move
+        applied to this Block's tree since then has already been undone.
+        """
+        name, direction, saved = record
+        if name == 'rotate':
+            self.rotate(4 - direction)
+        elif name == 'swap':
+            self.swap(direction)
+        elif name in ('smash', 'paint'):
+            # The children created by a smash are discarded.
             self.children = []
-            return True
-        return False
+            self.colour = saved
+            self._changed()
+        elif name == 'combine':
+            self.children = saved
+            self.colour = None
+            self._changed()
 
     def create_copy(self) -> Block:
         """Return a new Block that is a deep copy of this Block.
@@ -2,12 +2,13 @@
 """
 
 from __future__ import annotations
-from typing import Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
 import pygame
 
-from actions import ACTION_MESSAGE, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
+from actions import ACTION_MESSAGE
 from block import Block
+from controls import translate_event
+from engine import BackgroundMove, GameData, do_move
 from player import Player
 from renderer import Renderer
 from settings import ANIMATION_DURATION
@@ -38,67 +39,14 @@ def _block_to_squares(board: Block) -> List[Tuple[Tuple[int, int, int],
         return board_lst
 
 
-class GameData:
-    """
-    A bundle of the data needed for a Blocky game.
-
-    === Public Attributes ===
-    max_turns:
-        The maximum number of turns for the game.
-    board:
-        The Blocky board on which this game will be played.
-    players:
-        The entities that are playing this game.
-    smashes:
-        The number of smashes done by each player.
-    combines:
-        The number of combines done by each player.
-    paints:
-        The number of paints done by each player.
-
-    === Representation Invariants ===
-    - len(players) >= 1
-    """
-    max_turns: int
-    board: Block
-    players: List[Player]
-    smashes: Dict[int, int]
-    combines: Dict[int, int]
-    paints: Dict[int, int]
-
-    def __init__(self, board: Block, players: List[Player]) -> None:
-        """Initialize the game data, saving a reference to <board> and
-        <players>.
-
-        Precondition:
-            - len(players) >= 1
-        """
-        self.max_turns = 0
-        self.board = board
-        self.players = players
-
-        self.smashes = {}
-        self.combines = {}
-        self.paints = {}
-
-        # Start off all counts at 0
-        for player in players:
-            self.smashes[player.id] = 0
-            self.combines[player.id] = 0
-            self.paints[player.id] = 0
-
-    def calculate_score(self, player_id: int) -> Tuple[int, int]:
-        """Return a tuple containing first the <player_id>'s score based on
-        their goal in the game and second the deductions from their score based
-        on the actions they've taken.
-        """
-        goal_score = self.players[player_id].goal.score(self.board)
+def _board_version(board: Block) -> Tuple[int, int]:
+    """Return a value that identifies the current appearance of <board>, to
+    decide whether the renderer's cached image of it is up to date.
 
-        penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
-                  self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
-                  self.paints[player_id] * ACTION_PENALTY[PAINT]
-
-        return goal_score, penalty
+    The hash of the board is used rather than a count of moves, because AI
+    players try out moves on the board and then undo them.
+    """
+    return id(board), board.structure_hash()
 
 
 class GameState:
@@ -122,6 +70,17 @@ class GameState:
         """
         raise NotImplementedError
 
+    def is_animating(self) -> bool:
+        """Return True iff this GameState changes on screen without any
+        events, and so must be rendered at a steady frame rate.
+        """
+        return False
+
+    def cancel(self) -> None:
+        """Stop any work that this GameState is doing in the background.
+        """
+        return
+
 
 class MainState(GameState):
     """A GameState that manages the moves made by different players in Blocky.
@@ -135,10 +94,17 @@ class MainState(GameState):
     #   The index of the current player in GameData.players.
     # _current_score:
     #   The score of the current player, including penalties.
+    # _last_move:
+    #   The version of the board before the last move and the block that the
+    #   move was made on, or None if the board has been rendered since.
+    # _thinking:
+    #   The move the current player is choosing in the background, or None.
     _turn: int
     _data: GameData
     _current_player_index: int
     _current_score: int
+    _last_move: Optional[Tuple[Tuple[int, int], Block]]
+    _thinking: Optional[BackgroundMove]
 
     def __init__(self, data: GameData) -> None:
         """Initialize this GameState.
@@ -146,6 +112,8 @@ class MainState(GameState):
         self._turn = 0
         self._data = data
         self._current_player_index = 0
+        self._last_move = None
+        self._thinking = None
 
         score, penalty = self._data.calculate_score(self._current_player().id)
         self._current_score = score - penalty
@@ -167,41 +135,12 @@ class MainState(GameState):
         if self._current_player_index == 0:
             self._turn += 1
 
-    def _do_move(self, move: Tuple[str, Optional[int], Block]) -> bool:
-        """Attempt to do the player's requested move.
-        """
-        action = (move[0], move[1])
-        direction = move[1]
-        block = move[2]
-        player = self._current_player()
-        move_successful = False
-
-        if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
-            move_successful = block.rotate(direction)
-        elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
-            move_successful = block.swap(direction)
-        elif action == SMASH:
-            move_successful = block.smash()
-            self._data.smashes[player.id] += int(move_successful)
-        elif action == PAINT:
-            move_successful = block.paint(self._current_player().goal.colour)
-            self._data.paints[player.id] += int(move_successful)
-        elif action == COMBINE:
-            move_successful = block.combine()
-            self._data.combines[player.id] += int(move_successful)
-        elif action == PASS:
-            # Do nothing
-            move_successful = True
-
-        if move_successful:
-            self._update_player()
-
-        return move_successful
-
     def process_event(self, event: pygame.event.Event) -> None:
         """Process the given <event> for the current player's turn.
         """
-        self._current_player().process_event(event)
+        player_event = translate_event(event)
+        if player_event is not None:
+            self._current_player().process_event(player_event)
 
     def update(self) -> GameState:
         """Update the visual representation after a valid move is performed
@@ -210,8 +149,30 @@ class MainState(GameState):
         if self._turn >= self._data.max_turns:
             return GameOverState(self._data)
 
-        # Ask the player to make a move
-        move = self._current_player().generate_move(self._data.board)
+        # Mouse motion is only sent to the player whose turn it is, and not
+        # at all during animations, so point at the mouse again here to keep
+        # the selection current.
+        player = self._current_player()
+        if pygame.mouse.get_focused():
+            player.process_event(('point', pygame.mouse.get_pos()))
+
+        # Ask the player to make a move. Players that need time to think
+        # choose their move on another thread, so the window stays
+        # responsive.
+        if self._thinking is not None:
+            if not self._thinking.done():
+                return self
+            move = self._thinking.result(self._data.board)
+            self._thinking = None
+            if move is None:
+                # The move was cancelled or is out of date, so start again.
+                player.process_event(('proceed', None))
+                return self
+        elif player.ready_to_think():
+            self._thinking = BackgroundMove(player, self._data.board)
+            return self
+        else:
+            move = player.generate_move(self._data.board)
 
         if move is None:
             # No move was made, stay in the current state
@@ -219,13 +180,17 @@ class MainState(GameState):
         else:
             # Save what the board looks like before the move
             background = _block_to_squares(self._data.board)
+            version = _board_version(self._data.board)
             # Also save the current player ID
             player_id = self._current_player().id
 
             # Do the move
-            if self._do_move(move):
+            if do_move(self._data, self._current_player(), move):
+                self._update_player()
+                self._last_move = (version, move[2])
                 # Animate the move that was just done
-                return AnimateMoveState(self, player_id, move, background)
+                return AnimateMoveState(self, player_id, move, background,
+                                        version)
             else:
                 # The move was not valid, let the player try again
                 return self
@@ -234,17 +199,46 @@ class MainState(GameState):
         """Process the updated version of the board through <renderer>, and
         display it to Blocky's user interface.
         """
-        renderer.draw_board(_block_to_squares(self._data.board))
+        version = _board_version(self._data.board)
+        if not renderer.has_board(version):
+            if self._last_move is not None and \
+                    renderer.has_board(self._last_move[0]):
+                # A move only changes the area of the block it was made on.
+                b = self._last_move[1]
+                renderer.cache_region(_block_to_squares(b), b.position, b.size,
+                                      version)
+            else:
+                renderer.cache_board(_block_to_squares(self._data.board),
+                                     version)
+        self._last_move = None
+        renderer.draw_cached_board()
 
         b = self._current_player().get_selected_block(self._data.board)
         if b is not None:
             renderer.highlight_block(b.position, b.size)
 
         p = self._current_player()
-        status = f'Turn {self._turn} | Player {p.id} | ' \
-                 f'Score {self._current_score} | {p.goal.description()}'
+        if self._thinking is not None:
+            status = f'Turn {self._turn} | Player {p.id} is thinking... ' \
+                     f'{p.progress():.0%}'
+        else:
+            status = f'Turn {self._turn} | Player {p.id} | ' \
+                     f'Score {self._current_score} | {p.goal.description()}'
         renderer.draw_status(status)
 
+    def is_animating(self) -> bool:
+        """Return True while a player is thinking, so that its progress is
+        shown.
+        """
+        return self._thinking is not None
+
+    def cancel(self) -> None:
+        """Stop the current player from choosing a move in the background.
+        """
+        if self._thinking is not None:
+            self._thinking.cancel()
+            self._thinking = None
+
 
 class AnimateMoveState(GameState):
     """A GameState that animates a move made by a player before returning to its
@@ -261,22 +255,27 @@ class AnimateMoveState(GameState):
     #   The time that the animation started.
     # _background:
     #   The board to display behind the animation.
+    # _background_version:
+    #   The version of the board in _background, as given by _board_version.
     _parent: GameState
     _player_id: int
     _move: Tuple[str, Optional[int], Block]
     _start_time: int
     _background: List[Tuple[Tuple[int, int, int], Tuple[int, int], int]]
+    _background_version: Tuple[int, int]
 
     def __init__(self, parent: GameState, player_id: int,
                  move: Tuple[str, Optional[int], Block],
                  background: List[Tuple[Tuple[int, int, int], Tuple[int, int],
-                                        int]]) -> None:
+                                        int]],
+                 background_version: Tuple[int, int]) -> None:
         """Initialize this GameState.
         """
         self._parent = parent
         self._player_id = player_id
         self._move = move
         self._background = background
+        self._background_version = background_version
         self._start_time = pygame.time.get_ticks()
 
     def process_event(self, event: pygame.event.Event) -> None:
@@ -284,6 +283,11 @@ class AnimateMoveState(GameState):
         """
         return  # Ignore the event
 
+    def is_animating(self) -> bool:
+        """Return True, since the animation runs until it is complete.
+        """
+        return True
+
     def update(self) -> GameState:
         """Return the last GameState if the animation of processing a move has
         completed running. Otherwise, continue displaying the animaton.
@@ -292,8 +296,8 @@ class AnimateMoveState(GameState):
 
         if elapsed_seconds > ANIMATION_DURATION:
             # The animation is complete, do the move, go back to the last
-            # GameState
-            return self._parent
+            # GameState, updating it so that it is up to date when rendered
+            return self._parent.update()
         else:
             # The animation is still running, remain in this GameState
             return self
@@ -303,7 +307,10 @@ class AnimateMoveState(GameState):
         and outline around the block that the move is being processed on.
         And update the status message of the player.
         """
-        renderer.draw_board(self._background)
+        # The board from before the move is usually still cached.
+        if not renderer.has_board(self._background_version):
+            renderer.cache_board(self._background, self._background_version)
+        renderer.draw_cached_board()
 
         # Draw an outline around the selected block
         b = self._move[2]
@@ -376,7 +383,8 @@ if __name__ == '__main__':
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'pygame', '__future__',
-            'block', 'player', 'renderer', 'settings', 'actions'
+            'block', 'player', 'renderer', 'settings', 'actions', 'controls',
+            'engine'
         ],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,188 @@
+"""
+This file contains a compact binary format for Blocky boards.
+
+An encoded board starts with a three-byte header: the board's max_depth, then
+its size as a big-endian 16-bit number. The blocks follow in preorder (a
+block, then each of its children in order), packed as bits from the most
+significant bit of each byte:
+
+- every block above max_depth has one bit, which is 1 iff it is subdivided;
+- every leaf has two bits, the index of its colour in COLOUR_LIST.
+
+A block at max_depth is always a leaf, so it has no structure bit. The last
+byte is padded with zero bits.
+"""
+from __future__ import annotations
+from typing import List, Tuple
+
+from block import Block
+from settings import COLOUR_LIST
+
+# The number of bytes before the encoded blocks
+HEADER_SIZE = 3
+
+# The number of bits in the colour index of each leaf, which must be enough
+# for every colour in COLOUR_LIST
+_COLOUR_BITS = 2
+if len(COLOUR_LIST) > 1 << _COLOUR_BITS:
+    raise ValueError('COLOUR_LIST has too many colours for the board encoding')
+
+_COLOUR_INDEX = {colour: i for i, colour in enumerate(COLOUR_LIST)}
+
+
+class _BitWriter:
+    """Packs bits into a bytearray, most significant bit first.
+
+    === Public Attributes ===
+    data:
+        The bytes completed so far.
+    """
+    # === Private Attributes ===
+    # _current:
+    #   The bits of the byte being filled.
+    # _count:
+    #   The number of bits in _current.
+    data: bytearray
+    _current: int
+    _count: int
+
+    def __init__(self, data: bytearray) -> None:
+        """Initialize this writer to append to <data>."""
+        self.data = data
+        self._current = 0
+        self._count = 0
+
+    def write(self, value: int, bits: int) -> None:
+        """Append the lowest <bits> bits of <value>."""
+        for shift in range(bits - 1, -1, -1):
+            self._current = (self._current << 1) | ((value >> shift) & 1)
+            self._count += 1
+            if self._count == 8:
+                self.data.append(self._current)
+                self._current = 0
+                self._count = 0
+
+    def flush(self) -> None:
+        """Append the byte being filled, padded with zero bits."""
+        if self._count:
+            self.data.append(self._current << (8 - self._count))
+            self._current = 0
+            self._count = 0
+
+
+class _BitReader:
+    """Reads bits from bytes, most significant bit first."""
+    # === Private Attributes ===
+    # _data:
+    #   The bytes being read.
+    # _position:
+    #   The index of the next bit to read, counted from the start of _data.
+    _data: bytes
+    _position: int
+
+    def __init__(self, data: bytes, start: int) -> None:
+        """Initialize this reader to read <data> from byte <start>."""
+        self._data = data
+        self._position = start * 8
+
+    def read(self, bits: int) -> int:
+        """Return the next <bits> bits as an integer.
+
+        Raise ValueError if there are not enough bits left.
+        """
+        value = 0
+        for _ in range(bits):
+            index = self._position >> 3
+            if index >= len(self._data):
+                raise ValueError('encoded board is truncated')
+            value = (value << 1) | \
+                ((self._data[index] >> (7 - (self._position & 7))) & 1)
+            self._position += 1
+        return value
+
+
+def encode_board(board: Block) -> bytes:
+    """Return the encoding of <board>.
+
+    Raise ValueError if a leaf of <board> has a colour that is not in
+    COLOUR_LIST, or if its max_depth or size do not fit in the header.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[1], 0, 2)
+    >>> encode_board(board).hex()
+    '0202ee20'
+
+    Precondition: <board> is the root of its board (its level is 0).
+    """
+    if not 0 <= board.max_depth <= 0xff:
+        raise ValueError(f'cannot encode the max_depth {board.max_depth}')
+    if not 0 <= board.size <= 0xffff:
+        raise ValueError(f'cannot encode the size {board.size}')
+    writer = _BitWriter(bytearray([board.max_depth]) +
+                        board.size.to_bytes(2, 'big'))
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if block.level < block.max_depth:
+            writer.write(1 if block.children else 0, 1)
+        if block.children:
+            # Reversed, so that the children are popped in order.
+            stack.extend(reversed(block.children))
+        elif block.colour in _COLOUR_INDEX:
+            writer.write(_COLOUR_INDEX[block.colour], _COLOUR_BITS)
+        else:
+            raise ValueError(f'cannot encode the colour {block.colour}')
+    writer.flush()
+    return bytes(writer.data)
+
+
+def decode_board(data: bytes) -> Block:
+    """Return the board encoded in <data>.
+
+    <data> can be any bytes-like object, such as a memoryview. Raise
+    ValueError if <data> is not a valid encoding.
+
+    >>> board = Block((0, 0), 750, COLOUR_LIST[1], 0, 2)
+    >>> board.smash()
+    True
+    >>> decode_board(encode_board(board)) == board
+    True
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError('encoded board is truncated')
+    max_depth = data[0]
+    size = int.from_bytes(data[1:HEADER_SIZE], 'big')
+    reader = _BitReader(data, HEADER_SIZE)
+    return _decode_block(reader, (0, 0), size, 0, max_depth)
+
+
+def _decode_block(reader: _BitReader, position: Tuple[int, int], size: int,
+                  level: int, max_depth: int) -> Block:
+    """Return the block at <position>, <size> and <level> whose encoding is
+    next in <reader>.
+    """
+    if level < max_depth and reader.read(1):
+        block = Block(position, size, None, level, max_depth)
+        # Children are laid out exactly as in Block._children_positions.
+        half = round(size / 2.0)
+        x, y = position
+        positions = [(x + half, y), (x, y), (x, y + half),
+                     (x + half, y + half)]
+        children: List[Block] = []
+        for child_position in positions:
+            children.append(_decode_block(reader, child_position, half,
+                                          level + 1, max_depth))
+        block.children = children
+        return block
+    colour = reader.read(_COLOUR_BITS)
+    if colour >= len(COLOUR_LIST):
+        raise ValueError(f'invalid colour index {colour}')
+    return Block(position, size, COLOUR_LIST[colour], level, max_depth)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'block', 'settings'
+        ]
+    })
@@ -0,0 +1,62 @@
+"""
+This file contains the keyboard and mouse controls for the Blocky game, which
+translate pygame events into the events that Players understand.
+
+This is the only place where Players meet pygame, so the rest of the game can
+run without it.
+"""
+from typing import Optional
+import pygame
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE
+from player import PlayerEvent
+
+ACTION_KEY = {
+    ROTATE_CLOCKWISE: pygame.K_d,
+    ROTATE_COUNTER_CLOCKWISE: pygame.K_a,
+    SWAP_HORIZONTAL: pygame.K_q,
+    SWAP_VERTICAL: pygame.K_e,
+    SMASH: pygame.K_SPACE,
+    COMBINE: pygame.K_c,
+    PAINT: pygame.K_r,
+    PASS: pygame.K_TAB
+}
+
+# Create a dictionary that is ACTION_KEY inverted
+KEY_ACTION = {value: key for key, value in ACTION_KEY.items()}
+
+# The keys that move the selection up or down a level
+LEVEL_KEY = {
+    pygame.K_w: -1,
+    pygame.K_s: 1
+}
+
+
+def translate_event(event: pygame.event.Event) -> Optional[PlayerEvent]:
+    """Return the PlayerEvent for the pygame <event>, or None if no player
+    responds to <event>.
+
+    Key presses choose an action or change the level, moving the mouse points
+    at a location, and a left click asks an AI player to move.
+    """
+    if event.type == pygame.KEYDOWN:
+        if event.key in KEY_ACTION:
+            return 'action', KEY_ACTION[event.key]
+        elif event.key in LEVEL_KEY:
+            return 'level', LEVEL_KEY[event.key]
+    elif event.type == pygame.MOUSEMOTION:
+        return 'point', event.pos
+    elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        return 'proceed', None
+    return None
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', 'pygame', 'actions', 'player'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,205 @@
+"""
+This file contains a corpus of Blocky boards stored on disk, so that the same
+boards can be reused across runs without generating them again.
+
+A corpus file has three parts:
+
+- a 24-byte header: the magic bytes b'BLKC', a format version (uint32), the
+  number of boards (uint64) and the file offset of the index (uint64);
+- the boards, each encoded by codec.encode_board, one after another;
+- the index: one offset (uint64) per board, then the offset where the boards
+  end, so board i lies between entries i and i + 1.
+
+All numbers are little-endian. The file is read through mmap, so opening a
+corpus does not read it, and every record is a zero-copy memoryview.
+
+Generate a corpus from the command line, for example:
+
+    python corpus.py boards.corpus --count 100000 --depths 3 6
+"""
+from __future__ import annotations
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+import argparse
+import mmap
+import random
+import struct
+
+from block import Block, generate_board
+from codec import decode_board, encode_board
+from settings import BOARD_SIZE
+
+MAGIC = b'BLKC'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sIQQ')
+_OFFSET = struct.Struct('<Q')
+
+
+def write_corpus(path: str, records: Iterable[bytes]) -> int:
+    """Write a corpus file at <path> holding each of <records>, which are
+    boards encoded by codec.encode_board, and return the number of records.
+
+    The records are streamed to the file, so <records> can be a generator.
+    """
+    with open(path, 'wb') as file:
+        file.write(bytes(_HEADER.size))
+        offsets = []
+        position = _HEADER.size
+        for record in records:
+            offsets.append(position)
+            file.write(record)
+            position += len(record)
+        offsets.append(position)
+        _write_index(file, offsets)
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, VERSION, len(offsets) - 1, position))
+    return len(offsets) - 1
+
+
+def _write_index(file: BinaryIO, offsets: List[int]) -> None:
+    """Write <offsets> to <file> as little-endian uint64s."""
+    file.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+
+
+def generate_records(count: int, depths: List[int], seed: int = 0,
+                     size: int = BOARD_SIZE) -> Iterator[bytes]:
+    """Yield <count> encoded boards with dimensions <size> by <size>.
+
+    Board i has the max_depth depths[i % len(depths)] and is generated with
+    the random seed <seed> + i, so the same arguments give the same boards.
+
+    Precondition: <depths> is not empty.
+    """
+    for i in range(count):
+        random.seed(seed + i)
+        yield encode_board(generate_board(depths[i % len(depths)], size))
+
+
+class Corpus:
+    """A read-only corpus of encoded boards, memory-mapped from a file.
+
+    Corpus objects support len(), indexing and iteration, all of which give
+    the encoded records as memoryviews into the mapped file. Use board() to
+    decode a record.
+    """
+    # === Private Attributes ===
+    # _file:
+    #   The open corpus file.
+    # _map:
+    #   The memory map of _file.
+    # _view:
+    #   A memoryview of _map, from which records are sliced.
+    # _count:
+    #   The number of records in the corpus.
+    # _index:
+    #   The file offset of the index.
+    _file: BinaryIO
+    _map: mmap.mmap
+    _view: Optional[memoryview]
+    _count: int
+    _index: int
+
+    def __init__(self, path: str) -> None:
+        """Open the corpus file at <path>.
+
+        Raise ValueError if the file is not a corpus.
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f'{path} is not a board corpus')
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a board corpus')
+        magic, version, self._count, self._index = \
+            _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or \
+                self._index + (self._count + 1) * _OFFSET.size > \
+                len(self._map):
+            self.close()
+            raise ValueError(f'{path} is not a board corpus')
+        self._view = memoryview(self._map)
+
+    def __len__(self) -> int:
+        """Return the number of boards in this corpus."""
+        return self._count
+
+    def __getitem__(self, index: int) -> memoryview:
+        """Return the encoded board at <index>, without copying it.
+
+        Negative indices count from the end. Raise IndexError if <index> is
+        out of range, and ValueError if the index entries for the board do
+        not lie in order between the header and the index.
+        """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('corpus index out of range')
+        start, = _OFFSET.unpack_from(self._map,
+                                     self._index + index * _OFFSET.size)
+        end, = _OFFSET.unpack_from(self._map,
+                                   self._index + (index + 1) * _OFFSET.size)
+        if not _HEADER.size <= start <= end <= self._index:
+            raise ValueError(f'corpus record {index} has a corrupt offset')
+        return self._view[start:end]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        """Yield each encoded board in order, without copying them."""
+        for index in range(self._count):
+            yield self[index]
+
+    def board(self, index: int) -> Block:
+        """Return the board at <index>, decoded."""
+        return decode_board(self[index])
+
+    def close(self) -> None:
+        """Close this corpus.
+
+        Precondition: no memoryview returned by this corpus is still in use.
+        """
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> Corpus:
+        """Return this corpus, for use in a with statement."""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close this corpus at the end of a with statement."""
+        self.close()
+
+
+def main(argv: List[str] = None) -> None:
+    """Generate a corpus as configured by the command-line arguments <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Generate a corpus of random Blocky boards.')
+    parser.add_argument('path', help='the corpus file to write')
+    parser.add_argument('--count', type=int, default=10000,
+                        help='number of boards')
+    parser.add_argument('--depths', type=int, nargs=2, default=[3, 6],
+                        metavar=('MIN', 'MAX'),
+                        help='range of max_depths, used in turn')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first board')
+    args = parser.parse_args(argv)
+
+    if args.count < 1:
+        parser.error('--count must be at least 1')
+    if not 0 <= args.depths[0] <= args.depths[1]:
+        parser.error('--depths must satisfy 0 <= MIN <= MAX')
+
+    depths = list(range(args.depths[0], args.depths[1] + 1))
+    count = write_corpus(args.path, generate_records(args.count, depths,
+                                                     args.seed))
+    print(f'Wrote {count} boards to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+This file contains the core of the Blocky game: the shared GameData, the rules
+for performing a move, BackgroundMove, which lets a player choose its move on
+another thread, and HeadlessGame, which plays a full game between AI players
+without a display.
+
+Nothing in this file depends on pygame. The game states in blocky.py draw on
+top of it.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+import random
+import threading
+import time
+
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
+from block import Block, block_at, path_to
+from player import Player
+from replay import GameLog
+
+
+class GameData:
+    """
+    A bundle of the data needed for a Blocky game.
+
+    === Public Attributes ===
+    max_turns:
+        The maximum number of turns for the game.
+    board:
+        The Blocky board on which this game will be played.
+    players:
+        The entities that are playing this game.
+    smashes:
+        The number of smashes done by each player.
+    combines:
+        The number of combines done by each player.
+    paints:
+        The number of paints done by each player.
+    log:
+        The log that every move is recorded to, or None if the game is not
+        recorded.
+
+    === Representation Invariants ===
+    - len(players) >= 1
+    """
+    max_turns: int
+    board: Block
+    players: List[Player]
+    smashes: Dict[int, int]
+    combines: Dict[int, int]
+    paints: Dict[int, int]
+    log: Optional[GameLog]
+
+    def __init__(self, board: Block, players: List[Player]) -> None:
+        """Initialize the game data, saving a reference to <board> and
+        <players>.
+
+        Precondition:
+            - len(players) >= 1
+        """
+        self.max_turns = 0
+        self.board = board
+        self.players = players
+        self.log = None
+
+        self.smashes = {}
+        self.combines = {}
+        self.paints = {}
+
+        # Start off all counts at 0
+        for player in players:
+            self.smashes[player.id] = 0
+            self.combines[player.id] = 0
+            self.paints[player.id] = 0
+
+    def calculate_score(self, player_id: int) -> Tuple[int, int]:
+        """Return a tuple containing first the <player_id>'s score based on
+        their goal in the game and second the deductions from their score based
+        on the actions they've taken.
+        """
+        goal_score = self.players[player_id].goal.score(self.board)
+
+        penalty = self.smashes[player_id] * ACTION_PENALTY[SMASH] + \
+                  self.combines[player_id] * ACTION_PENALTY[COMBINE] + \
+                  self.paints[player_id] * ACTION_PENALTY[PAINT]
+
+        return goal_score, penalty
+
+
+def do_move(data: GameData, player: Player,
+            move: Tuple[str, Optional[int], Block]) -> bool:
+    """Attempt to do <player>'s requested <move> on the board of <data>, and
+    count it against <player> if it carries a penalty.
+
+    If the game is being recorded, the move is played with its own random
+    seed, so that a replay of it gives the same board, and is added to the
+    log if it was performed.
+
+    Return True iff the move was performed.
+    """
+    if data.log is None:
+        return _do_move(data, player, move)
+
+    state = random.getstate()
+    random.seed(data.log.next_seed())
+    try:
+        move_successful = _do_move(data, player, move)
+    finally:
+        random.setstate(state)
+    if move_successful:
+        data.log.record(player.id, (move[0], move[1]),
+                        path_to(data.board, move[2]), data.board)
+    return move_successful
+
+
+def _do_move(data: GameData, player: Player,
+             move: Tuple[str, Optional[int], Block]) -> bool:
+    """Attempt to do <player>'s requested <move> on the board of <data>, as
+    described in do_move, without recording it.
+    """
+    action = (move[0], move[1])
+    direction = move[1]
+    block = move[2]
+    move_successful = False
+
+    if action in [ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE]:
+        move_successful = block.rotate(direction)
+    elif action in [SWAP_HORIZONTAL, SWAP_VERTICAL]:
+        move_successful = block.swap(direction)
+    elif action == SMASH:
+        move_successful = block.smash()
+        data.smashes[player.id] += int(move_successful)
+    elif action == PAINT:
+        move_successful = block.paint(player.goal.colour)
+        data.paints[player.id] += int(move_successful)
+    elif action == COMBINE:
+        move_successful = block.combine()
+        data.combines[player.id] += int(move_successful)
+    elif action == PASS:
+        # Do nothing
+        move_successful = True
+
+    return move_successful
+
+
+class BackgroundMove:
+    """A move being chosen by a player on a worker thread.
+
+    The player works on a private copy of the board, so the board itself can
+    still be drawn while it thinks. The chosen move is mapped back onto the
+    board by the path of its block.
+
+    === Public Attributes ===
+    player:
+        The player choosing the move.
+    """
+    # === Private Attributes ===
+    # _snapshot:
+    #   The copy of the board that the player is working on.
+    # _version:
+    #   The structure hash of the board when the copy was taken.
+    # _move:
+    #   The move chosen on _snapshot, or None if there is none yet.
+    # _thread:
+    #   The thread choosing the move.
+    player: Player
+    _snapshot: Block
+    _version: int
+    _move: Optional[Tuple[str, Optional[int], Block]]
+    _thread: threading.Thread
+
+    def __init__(self, player: Player, board: Block) -> None:
+        """Start choosing <player>'s move on a copy of <board>.
+        """
+        self.player = player
+        self._snapshot = board.create_copy()
+        self._version = board.structure_hash()
+        self._move = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Choose the move. This runs on the worker thread.
+        """
+        self._move = self.player.generate_move(self._snapshot)
+
+    def done(self) -> bool:
+        """Return True iff the player has finished choosing its move.
+        """
+        return not self._thread.is_alive()
+
+    def cancel(self) -> None:
+        """Ask the player to stop choosing its move, and wait until it has.
+        """
+        self.player.cancel()
+        self._thread.join()
+
+    def result(self, board: Block) -> Optional[Tuple[str, Optional[int],
+                                                      Block]]:
+        """Return the chosen move, acting on the matching block of <board>.
+
+        Return None if no move was chosen, or if <board> has changed since
+        the move started, in which case the move may no longer be valid.
+
+        Precondition: self.done()
+        """
+        if self._move is None or board.structure_hash() != self._version:
+            return None
+        action, direction, block = self._move
+        return action, direction, block_at(board,
+                                           path_to(self._snapshot, block))
+
+
+class HeadlessGame:
+    """A game of Blocky between AI players, played without a display or an
+    event loop.
+
+    === Public Attributes ===
+    data:
+        The data of the game.
+    turn:
+        The number of turns that have been played.
+    think_times:
+        The number of seconds each player took to choose each of its moves,
+        keyed by player ID.
+
+    === Representation Invariants ===
+    - No player in data.players is a HumanPlayer.
+    """
+    data: GameData
+    turn: int
+    think_times: Dict[int, List[float]]
+
+    def __init__(self, data: GameData) -> None:
+        """Initialize this game with <data>.
+
+        Precondition: no player in data.players is a HumanPlayer.
+        """
+        self.data = data
+        self.turn = 0
+        self.think_times = {player.id: [] for player in data.players}
+
+    def play_turn(self) -> None:
+        """Let every player make one move, in order.
+
+        A player whose move cannot be performed passes instead.
+        """
+        for player in self.data.players:
+            player.process_event(('proceed', None))
+            start = time.perf_counter()
+            move = player.generate_move(self.data.board)
+            self.think_times[player.id].append(time.perf_counter() - start)
+            if move is not None:
+                do_move(self.data, player, move)
+        self.turn += 1
+
+    def run(self, num_turns: int) -> List[Tuple[int, int, int]]:
+        """Play <num_turns> turns, and return each player's ID, goal score
+        and penalty at the end of the game, in the order of data.players.
+        """
+        self.data.max_turns = num_turns
+        while self.turn < num_turns:
+            self.play_turn()
+        scores = []
+        for player in self.data.players:
+            goal_score, penalty = self.data.calculate_score(player.id)
+            scores.append((player.id, goal_score, penalty))
+        return scores
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__',
+            'threading', 'time', 'actions', 'block', 'player', 'replay'
+        ]
+    })
@@ -5,15 +5,27 @@ Blocky game.
 At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
-from typing import List
+from collections import deque
+from typing import Deque, Dict, List, Optional
+import random
+import time
 import pygame
 
+import instrument
 from block import generate_board
 from blocky import GameData, GameState, MainState
 from player import create_players
 from renderer import Renderer
+from replay import GameLog
 from settings import BOARD_SIZE
 
+# The longest time, in milliseconds, that the game waits for an event while
+# nothing is changing on screen
+IDLE_TIMEOUT = 250
+
+# The number of most recent frame times kept for frame_stats()
+FRAME_SAMPLES = 1000
+
 
 class Game:
     """A game of Blocky.
@@ -25,51 +37,135 @@ class Game:
     #   The data of the game that can be shared with other GameState objects.
     # _state:
     #   The current GameState.
+    # _frame_times:
+    #   The number of seconds taken to update and render each of the most
+    #   recent frames.
     _renderer: Renderer
     _data: GameData
     _state: GameState
+    _frame_times: Deque[float]
 
     def __init__(self, max_depth: int,
                  num_human: int,
                  num_random: int,
-                 smart_players: List[int]) -> None:
+                 smart_players: List[int],
+                 seed: Optional[int] = None,
+                 log_path: Optional[str] = None) -> None:
         """Initialize this game, as described in the Assignment 2 handout.
 
+        The board and goals are generated from the random <seed>, or from a
+        new random seed if it is None. If <log_path> is given, the game is
+        recorded to that file, to be read with replay.Replay.
+
         Precondition:
             2 <= max_depth <= 5
         """
+        if seed is None:
+            seed = random.getrandbits(32)
+        random.seed(seed)
         board = generate_board(max_depth, BOARD_SIZE)
         players = create_players(num_human, num_random, smart_players)
 
         self._renderer = Renderer(BOARD_SIZE)
+        self._renderer.preload_images(BOARD_SIZE, max_depth)
         self._data = GameData(board, players)
+        if log_path is not None:
+            self._data.log = GameLog(log_path, seed, board,
+                                     [player.goal for player in players])
         self._state = MainState(self._data)
+        self._frame_times = deque(maxlen=FRAME_SAMPLES)
 
-    def run_game(self, num_turns: int) -> None:
+    def run_game(self, num_turns: int,
+                 profile_path: Optional[str] = None,
+                 max_fps: int = 30) -> None:
         """Start the main game loop and stop after num_turns.
+
+        The screen is redrawn at most <max_fps> times a second, and only when
+        something changed or an animation is running.
+
+        When the game ends, the frame_stats() are printed. If <profile_path>
+        is given, the game's hot paths are instrumented while it runs, and
+        their timings are written to that file as JSON when the game ends,
+        along with the frame_stats() under the key 'frames'.
         """
         self._data.max_turns = num_turns
+        if profile_path is not None:
+            instrument.enable()
+        try:
+            self._main_loop(max_fps)
+        finally:
+            frames = self.frame_stats()
+            print(f"Drew {frames['frames']} frames: "
+                  f"mean {frames['mean_ms']:.2f}ms, "
+                  f"p50 {frames['p50_ms']:.2f}ms, "
+                  f"p90 {frames['p90_ms']:.2f}ms, "
+                  f"p99 {frames['p99_ms']:.2f}ms")
+            if profile_path is not None:
+                instrument.disable()
+                instrument.dump(profile_path, {'frames': frames})
+            if self._data.log is not None:
+                self._data.log.close()
+
+    def _main_loop(self, max_fps: int) -> None:
+        """Run the main game loop until the window is closed.
+
+        While nothing is animating and nothing has changed, the loop sleeps
+        until an event arrives, or for at most IDLE_TIMEOUT milliseconds.
+        """
         clock = pygame.time.Clock()
+        redraw = True
 
         while True:
-            clock.tick(30)
+            clock.tick(max_fps)
+
+            # Wait for events, unless the screen must change anyway
+            events = []
+            if not redraw and not self._state.is_animating():
+                event = pygame.event.wait(IDLE_TIMEOUT)
+                if event.type != pygame.NOEVENT:
+                    events.append(event)
+            events.extend(pygame.event.get())
+
+            start = time.perf_counter()
 
             # Process events
-            for e in pygame.event.get():
+            for e in events:
                 if e.type == pygame.QUIT:
+                    self._state.cancel()
                     return
                 else:
                     self._state.process_event(e)
+                    redraw = True
 
             # Update the state of the game
-            self._state = self._state.update()
-
-            # Render the new state of the game
-            self._renderer.clear()
-            self._state.render(self._renderer)
-
-            # Update the screen
-            pygame.display.flip()
+            state = self._state.update()
+            if state is not self._state:
+                redraw = True
+            self._state = state
+
+            if redraw or self._state.is_animating():
+                # Render the new state of the game
+                self._renderer.clear()
+                self._state.render(self._renderer)
+
+                # Update the parts of the screen that changed
+                self._renderer.present()
+                self._frame_times.append(time.perf_counter() - start)
+                redraw = False
+
+    def frame_stats(self) -> Dict[str, float]:
+        """Return the number of recent frames that were drawn, and the mean,
+        50th, 90th and 99th percentile of the time taken to update and render
+        them, in milliseconds.
+        """
+        ordered = sorted(self._frame_times)
+        result = {'frames': len(ordered),
+                  'mean_ms': sum(ordered) * 1000 / max(1, len(ordered))}
+        for percent in (50, 90, 99):
+            rank = max(1, -(-len(ordered) * percent // 100))
+            result[f'p{percent}_ms'] = ordered[rank - 1] * 1000 \
+                if ordered else 0.0
+        return result
 
 
 def create_auto_game() -> Game:
@@ -112,6 +208,7 @@ if __name__ == '__main__':
         'allowed-io': ['run_game'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'pygame', 'blocky',
+            'instrument', 'collections', 'time', 'replay',
             'block', 'goal', 'player', 'renderer', 'settings'
         ],
         'generated-members': 'pygame.*'
@@ -46,49 +46,179 @@ def _flatten(block: Block) -> List[List[Tuple[int, int, int]]]:
     of the block at the cell location[i][j]
 
     L[0][0] represents the unit cell in the upper left corner of the Block.
+
+    The result is cached on <block> until it or one of its descendants is
+    mutated, and must not be modified by the caller.
     """
     if not block.children:
         return (2 ** (block.max_depth - block.level)) *\
                [(2 ** (block.max_depth - block.level) * [block.colour])]
 
+    return block.cached('flatten', _flatten_children)
+
+
+def _flatten_children(block: Block) -> List[List[Tuple[int, int, int]]]:
+    """Return the flattened representation of <block> built from the flattened
+    representations of its four children.
+
+    Precondition: <block> has four children.
+    """
+    upper_right, upper_left, lower_left, lower_right = \
+        [_flatten(child) for child in block.children]
+
+    # Each column of the left half joins a column of the upper-left child to
+    # the same column of the lower-left child, and likewise for the right half.
     board_colour = []
-    total_columns = 2 ** (block.max_depth - block.level)
-
-    for _ in range(total_columns):
-        board_colour.append([])
-    middle = len(board_colour) // 2
-
-    for child in block.children:
-        if child == block.children[0]:
-            # Work with board_colour[middle:] and each board from board[:middle]
-            flattened_child = _flatten(child)
-            for i in range(middle):
-                # Figuring our which lists
-                board_colour[middle + i].extend(flattened_child[i])
-
-        if child == block.children[1]:
-            # Work with board_colour[:middle] and each board from board[:middle]
-            flattened_child = _flatten(child)
-            for i in range(middle):
-                # Figuring our which lists
-                board_colour[i].extend(flattened_child[i])
-
-        if child == block.children[2]:
-            # Work with board_colour[:middle] and each board from board[middle:]
-            flattened_child = _flatten(child)
-            for i in range(middle):
-                # Figuring our which lists
-                board_colour[i].extend(flattened_child[i])
-
-        if child == block.children[3]:
-            # Work with board_colour[:middle] and each board from board[middle:]
-            flattened_child = _flatten(child)
-            for i in range(middle):
-                # Figuring our which lists
-                board_colour[middle + i].extend(flattened_child[i])
+    for i in range(len(upper_left)):
+        board_colour.append(upper_left[i] + lower_left[i])
+    for i in range(len(upper_right)):
+        board_colour.append(upper_right[i] + lower_right[i])
     return board_colour
 
 
+def _perimeter_counts(block: Block) -> List[int]:
+    """Return a list L where L[k] is the score of a PerimeterGoal with colour
+    COLOUR_LIST[k] on <block>.
+
+    The counts are cached on <block> until it or one of its descendants is
+    mutated, and must not be modified by the caller.
+    """
+    return _perimeter_sides(block)[4]
+
+
+def _perimeter_sides(block: Block) -> Tuple[List[int], ...]:
+    """Return the number of unit cells of each colour along each edge of
+    <block>, as a tuple (top, right, bottom, left, total).
+
+    Each of top, right, bottom and left is a list whose k-th element is the
+    number of unit cells of colour COLOUR_LIST[k] along that edge, and total is
+    their element-wise sum, so corner cells are counted twice.
+
+    Counts of subdivided blocks are built from those of their children and
+    cached on <block>.
+    """
+    if not block.children:
+        counts = [0] * len(COLOUR_LIST)
+        counts[COLOUR_LIST.index(block.colour)] = \
+            2 ** (block.max_depth - block.level)
+        return counts, counts, counts, counts, [4 * n for n in counts]
+
+    return block.cached('perimeter', _merge_perimeter_sides)
+
+
+def _merge_perimeter_sides(block: Block) -> Tuple[List[int], ...]:
+    """Return the per-colour counts along each edge of <block>, computed from
+    those of its four children.
+
+    Precondition: <block> has four children.
+    """
+    upper_right, upper_left, lower_left, lower_right = \
+        [_perimeter_sides(child) for child in block.children]
+    top = [a + b for a, b in zip(upper_left[0], upper_right[0])]
+    right = [a + b for a, b in zip(upper_right[1], lower_right[1])]
+    bottom = [a + b for a, b in zip(lower_left[2], lower_right[2])]
+    left = [a + b for a, b in zip(upper_left[3], lower_left[3])]
+    total = [a + b + c + d for a, b, c, d in zip(top, right, bottom, left)]
+    return top, right, bottom, left, total
+
+
+# A summary of the blobs of one colour inside a block, as a tuple
+# (closed, sizes, top, right, bottom, left), where:
+#   - closed is the size of the largest blob that does not touch the edge of
+#     the block, or 0 if there is none,
+#   - sizes[k] is the size of the k-th blob that touches the edge of the block,
+#   - top, right, bottom and left hold, for each unit cell along that edge of
+#     the block, the index in sizes of the blob it belongs to, or -1 if it is
+#     not of the colour. Top and bottom run left to right, and left and right
+#     run top to bottom.
+_BlobSummary = Tuple[int, List[int], List[int], List[int], List[int],
+                     List[int]]
+
+
+def _blob_summary(block: Block, colour: Tuple[int, int, int]) -> _BlobSummary:
+    """Return the summary of the blobs of <colour> inside <block>.
+
+    Summaries of subdivided blocks are built from those of their children and
+    cached on <block>, so after a move only the blocks on the path from the
+    mutated block to the root are summarized again.
+    """
+    if not block.children:
+        width = 2 ** (block.max_depth - block.level)
+        if block.colour != colour:
+            edge = [-1] * width
+            return 0, [], edge, edge, edge, edge
+        edge = [0] * width
+        return 0, [width * width], edge, edge, edge, edge
+
+    return block.cached(f'blob {colour}',
+                        lambda b: _merge_blob_summaries(b, colour))
+
+
+def _merge_blob_summaries(block: Block,
+                          colour: Tuple[int, int, int]) -> _BlobSummary:
+    """Return the summary of the blobs of <colour> inside <block>, computed by
+    joining the summaries of its four children along their shared edges.
+
+    Precondition: <block> has four children.
+    """
+    summaries = [_blob_summary(child, colour) for child in block.children]
+
+    # Give every edge blob of every child a distinct label.
+    offsets = []
+    sizes = []
+    closed = 0
+    for summary in summaries:
+        offsets.append(len(sizes))
+        sizes.extend(summary[1])
+        closed = max(closed, summary[0])
+    parent = list(range(len(sizes)))
+
+    def find(label: int) -> int:
+        """Return the representative label of the blob of <label>."""
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def edge(child: int, side: int) -> List[int]:
+        """Return the relabelled cells along <side> of the child <child>."""
+        offset = offsets[child]
+        return [label + offset if label >= 0 else -1
+                for label in summaries[child][side]]
+
+    # Children are upper-right, upper-left, lower-left, lower-right, and sides
+    # are indexed 2 to 5 as top, right, bottom, left in a summary.
+    shared = [(edge(1, 3), edge(0, 5)), (edge(2, 3), edge(3, 5)),
+              (edge(1, 4), edge(2, 2)), (edge(0, 4), edge(3, 2))]
+    for first, second in shared:
+        for a, b in zip(first, second):
+            if a >= 0 and b >= 0:
+                a, b = find(a), find(b)
+                if a != b:
+                    parent[b] = a
+                    sizes[a] += sizes[b]
+
+    sides = [edge(1, 2) + edge(0, 2), edge(0, 3) + edge(3, 3),
+             edge(2, 4) + edge(3, 4), edge(1, 5) + edge(2, 5)]
+
+    # Relabel the blobs that still touch the edge, and close the others.
+    relabel = {}
+    new_sizes = []
+    for side in sides:
+        for i, label in enumerate(side):
+            if label >= 0:
+                root = find(label)
+                if root not in relabel:
+                    relabel[root] = len(new_sizes)
+                    new_sizes.append(sizes[root])
+                side[i] = relabel[root]
+    for label in range(len(sizes)):
+        if parent[label] == label and label not in relabel:
+            closed = max(closed, sizes[label])
+
+    return closed, new_sizes, sides[0], sides[1], sides[2], sides[3]
+
+
 class Goal:
     """A player goal in the game of Blocky.
 
@@ -131,34 +261,14 @@ class PerimeterGoal(Goal):
 
         Note: <self.colour> unit cells positioned along the corners account
               for two points.
+
+        The per-colour counts are cached on <board>, so after a move only the
+        blocks on the path from the mutated block to the root are counted
+        again.
         """
-        # Store a 2-D representation of the input <board>.
-        flattened_board = _flatten(board)
-        # First column (all values are considered in PerimeterGoal's score)
-        first_column = flattened_board[0]
-        score_ = 0
-        for i in range(len(first_column)):
-            if first_column[i] == self.colour:
-                if i in (0, len(first_column) - 1):
-                    score_ += 2
-                else:
-                    score_ += 1
-        # Last column (all values are considered in PerimeterGoal's score)
-        last_column = flattened_board[-1]
-        for i in range(len(last_column)):
-            if last_column[i] == self.colour:
-                if i in (0, len(last_column) - 1):
-                    score_ += 2
-                else:
-                    score_ += 1
-        # Middle columns (First and last entires of columns are considered)
-        middle = flattened_board[1: -1]
-        for column in middle:
-            if self.colour == column[0]:
-                score_ += 1
-            if self.colour == column[-1]:
-                score_ += 1
-        return score_
+        if self.colour not in COLOUR_LIST:
+            return 0
+        return _perimeter_counts(board)[COLOUR_LIST.index(self.colour)]
 
     def description(self) -> str:
         """Return a string representation of the goal <PerimeterGoal>.
@@ -179,78 +289,8 @@ class BlobGoal(Goal):
         colour. Two blocks are connected if their sides touch; touching corners
         doesn’t count.
         """
-        flattened_board = _flatten(board)
-        length = len(flattened_board)
-        scores = []
-        visited = []
-        for _ in range(length):
-            visited.append([])
-
-        for i in range(length):
-            for _ in range(length):
-                visited[i].append(-1)
-
-        for i in range(length):
-            for j in range(length):
-                if visited[i][j] == -1:
-                    scores.append(self._undiscovered_blob_size((i, j),
-                                                               flattened_board,
-                                                               visited))
-        return max(scores)
-
-    def _undiscovered_blob_size(self, pos: Tuple[int, int],
-                                board: List[List[Tuple[int, int, int]]],
-                                visited: List[List[int]]) -> int:
-        """Return the size of the largest connected blob that:
-        (a) is of this Goal's target colour,
-        (b) includes the cell at <pos>, and
-        (c) involves only cells that have never been visited.
-
-        If <pos> is out of bounds for <board>, return 0.
-
-        <board> is the flattened board on which to search for the blob.
-        <visited> is a parallel structure that, in each cell, contains:
-            -1 if this cell has never been visited
-            0  if this cell has been visited and discovered
-               not to be of the target colour
-            1  if this cell has been visited and discovered
-               to be of the target colour
-
-        Update <visited> so that all cells that are visited are marked with
-        either 0 or 1.
-        """
-        if pos[0] < 0 or pos[1] < 0 or\
-           pos[0] >= len(board) or pos[1] >= len(board):
-            return 0
-        if visited[pos[0]][pos[1]] == 0:
-            return 0
-        if visited[pos[0]][pos[1]] == 1:
-            return 0
-        if visited[pos[0]][pos[1]] == -1 and\
-           board[pos[0]][pos[1]] != self.colour:
-            visited[pos[0]][pos[1]] = 0
-            return 0
-        if visited[pos[0]][pos[1]] == -1 and\
-           board[pos[0]][pos[1]] == self.colour:
-            visited[pos[0]][pos[1]] = 1
-            size = 1
-
-            adjacent_cells = []
-            if pos[0] > 0 and visited[pos[0] - 1][pos[1]] == -1:
-                adjacent_cells.append((pos[0] - 1, pos[1]))
-            if pos[1] > 0 and visited[pos[0]][pos[1] - 1] == -1:
-                adjacent_cells.append((pos[0], pos[1] - 1))
-            if pos[1] + 1 < len(board) and visited[pos[0]][pos[1] + 1] == -1:
-                adjacent_cells.append((pos[0], pos[1] + 1))
-            if pos[0] + 1 < len(board) and visited[pos[0] + 1][pos[1]] == -1:
-                adjacent_cells.append((pos[0] + 1, pos[1]))
-
-            for cell in adjacent_cells:
-                size += self._undiscovered_blob_size(cell, board, visited)
-
-            return size
-
-        return 0
+        summary = _blob_summary(board, self.colour)
+        return max([summary[0]] + summary[1])
 
     def description(self) -> str:
         """Return a string representation of the goal <BlobGoal>.
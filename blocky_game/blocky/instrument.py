@@ -0,0 +1,222 @@
+"""
+This file contains opt-in instrumentation for the hot paths of the Blocky
+game. When enabled, it wraps a set of functions and methods so that every call
+is counted and timed. When disabled, the original functions are restored, so
+it costs nothing at all.
+
+For example:
+
+    import instrument
+    instrument.enable()
+    ...  # play a game
+    print(instrument.stats())
+    instrument.dump('profile.json')
+    instrument.disable()
+"""
+from __future__ import annotations
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import functools
+import importlib
+import json
+import threading
+import time
+
+# The functions timed by default, as (module name, attribute path) pairs.
+# MainState.update and MainState.render are called once per frame.
+DEFAULT_TARGETS = [
+    ('goal', 'PerimeterGoal.score'),
+    ('goal', 'BlobGoal.score'),
+    ('block', 'Block.create_copy'),
+    ('blocky', '_block_to_squares'),
+    ('renderer', 'Renderer.cache_board'),
+    ('renderer', 'Renderer.cache_region'),
+    ('blocky', 'MainState.update'),
+    ('blocky', 'MainState.render')
+]
+
+# The number of most recent timings kept for each target, from which the
+# percentiles are computed.
+SAMPLE_SIZE = 10000
+
+
+class _Timings:
+    """The calls and timings recorded for one instrumented function.
+
+    === Public Attributes ===
+    calls:
+        The number of calls, including recursive ones.
+    timed:
+        The number of outermost calls, which are the ones that were timed.
+    total:
+        The total number of seconds spent in the timed calls.
+    samples:
+        The durations of the most recent timed calls, in seconds.
+
+    === Private Attributes ===
+    _local:
+        The state of each thread; its depth attribute, if set, is the number
+        of calls to the function currently in progress on that thread.
+    """
+    calls: int
+    timed: int
+    total: float
+    samples: Deque[float]
+    _local: threading.local
+
+    def __init__(self) -> None:
+        """Initialize these timings with no calls."""
+        self.calls = 0
+        self.timed = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+        self._local = threading.local()
+
+    def get_depth(self) -> int:
+        """Return the number of calls to the function currently in progress
+        on this thread.
+        """
+        return getattr(self._local, 'depth', 0)
+
+    def set_depth(self, depth: int) -> None:
+        """Record that <depth> calls to the function are currently in
+        progress on this thread.
+        """
+        self._local.depth = depth
+
+    def summary(self) -> Dict[str, float]:
+        """Return these timings as a JSON-compatible dictionary, in
+        milliseconds.
+        """
+        ordered = sorted(self.samples)
+        result = {
+            'calls': self.calls,
+            'timed_calls': self.timed,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total * 1000 / self.timed if self.timed else 0.0
+        }
+        for percent in (50, 90, 99):
+            if ordered:
+                rank = max(1, -(-len(ordered) * percent // 100))
+                result[f'p{percent}_ms'] = ordered[rank - 1] * 1000
+            else:
+                result[f'p{percent}_ms'] = 0.0
+        return result
+
+
+# The timings of each instrumented target, keyed by 'module.attribute'.
+_timings: Dict[str, _Timings] = {}
+
+# The owner, attribute name and original value of every patched target.
+_patched: List[Tuple[Any, str, Any]] = []
+
+
+def _wrap(function: Callable, timings: _Timings) -> Callable:
+    """Return a wrapper around <function> that records its calls in
+    <timings>.
+
+    Only the outermost of several nested calls on the same thread is timed,
+    so that recursive functions are not counted more than once.
+    """
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        timings.calls += 1
+        depth = timings.get_depth()
+        if depth:
+            timings.set_depth(depth + 1)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.set_depth(depth)
+        timings.set_depth(1)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            timings.set_depth(0)
+            timings.timed += 1
+            timings.total += elapsed
+            timings.samples.append(elapsed)
+    return wrapper
+
+
+def enabled() -> bool:
+    """Return True iff instrumentation is enabled."""
+    return bool(_patched)
+
+
+def enable(targets: Optional[List[Tuple[str, str]]] = None) -> None:
+    """Start counting and timing calls to <targets>, or to DEFAULT_TARGETS if
+    <targets> is None.
+
+    Each target is a (module name, attribute path) pair, such as
+    ('block', 'Block.create_copy'). Calls made through a name imported with
+    'from module import function' before this call are not seen.
+
+    Do nothing if instrumentation is already enabled.
+    """
+    if _patched:
+        return
+    for module_name, path in targets or DEFAULT_TARGETS:
+        owner = importlib.import_module(module_name)
+        *parents, name = path.split('.')
+        for parent in parents:
+            owner = getattr(owner, parent)
+        key = f'{module_name}.{path}'
+        timings = _timings.setdefault(key, _Timings())
+        # Read the attribute from __dict__ so that static methods stay static.
+        original = vars(owner)[name]
+        _patched.append((owner, name, original))
+        setattr(owner, name, _wrap(original, timings))
+
+
+def disable() -> None:
+    """Stop counting and timing calls, restoring every original function.
+
+    The timings recorded so far are kept.
+    """
+    while _patched:
+        owner, name, original = _patched.pop()
+        setattr(owner, name, original)
+
+
+def reset() -> None:
+    """Discard every timing recorded so far.
+
+    Calls in progress are still timed when they return.
+    """
+    for timings in _timings.values():
+        timings.calls = 0
+        timings.timed = 0
+        timings.total = 0.0
+        timings.samples.clear()
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Return a summary of the timings of every instrumented target, keyed by
+    'module.attribute'.
+    """
+    return {key: timings.summary() for key, timings in _timings.items()}
+
+
+def dump(path: str, extra: Optional[Dict[str, Any]] = None) -> None:
+    """Write stats() to the file at <path>, as JSON, together with the
+    entries of <extra> if it is given.
+    """
+    result = stats()
+    if extra is not None:
+        result.update(extra)
+    with open(path, 'w') as file:
+        json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['dump'],
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'collections',
+            'functools', 'importlib', 'json', 'threading', 'time'
+        ]
+    })
@@ -0,0 +1,298 @@
+"""
+This file contains PersistentBlock and PersistentBoard, an immutable version
+of the Block tree in which applying a move returns a new board that shares
+every untouched subtree with the old one.
+
+A Block stores its position, size and level, so a subtree that moves (as in a
+swap or rotate) cannot be shared between two boards. A PersistentBlock stores
+none of these: they are determined by the block's path from the root. Rotations
+are also recorded lazily, as a number of pending clockwise quarter turns, so
+every move only creates new blocks along the path from the root to the block
+being acted on, plus the new children of a smash.
+"""
+from __future__ import annotations
+from typing import List, Optional, Sequence, Tuple
+import math
+import random
+
+from block import Block
+from settings import COLOUR_LIST
+
+# The new child at index j is the old child at index ORDER[j].
+_SWAP_ORDER = {0: (1, 0, 3, 2), 1: (3, 2, 1, 0)}
+
+
+class PersistentBlock:
+    """An immutable square block in a PersistentBoard.
+
+    === Public Attributes ===
+    colour:
+        If this block is not subdivided, <colour> stores its colour. Otherwise,
+        <colour> is None.
+
+    === Representation Invariants ===
+    - len(_children) == 0 or len(_children) == 4
+    - colour is None iff len(_children) == 4
+    - 0 <= _turns < 4, and _turns == 0 if this block has no children
+    """
+    # === Private Attributes ===
+    # _children:
+    #   The children of this block, before the pending turns are applied.
+    # _turns:
+    #   The number of clockwise quarter turns that have been applied to this
+    #   block but not yet pushed down to its children.
+    # _rotated:
+    #   The children of this block after the pending turns are applied, or
+    #   None if they have not been computed yet.
+    __slots__ = ('colour', '_children', '_turns', '_rotated')
+    colour: Optional[Tuple[int, int, int]]
+    _children: Tuple[PersistentBlock, ...]
+    _turns: int
+    _rotated: Optional[Tuple[PersistentBlock, ...]]
+
+    def __init__(self, colour: Optional[Tuple[int, int, int]],
+                 children: Tuple[PersistentBlock, ...] = (),
+                 turns: int = 0) -> None:
+        """Initialize this block with <colour> and <children>, rotated
+        clockwise by <turns> quarter turns.
+
+        Precondition: <colour> is None iff len(children) == 4.
+        """
+        self.colour = colour
+        self._children = children
+        self._turns = turns % 4 if children else 0
+        self._rotated = None if self._turns else children
+
+    @property
+    def children(self) -> Tuple[PersistentBlock, ...]:
+        """The children of this block, in the same order as Block.children:
+        upper-right, upper-left, lower-left, lower-right.
+        """
+        if self._rotated is None:
+            # Rotating clockwise once makes child j the old child j + 1,
+            # itself rotated clockwise once.
+            turns = self._turns
+            self._rotated = tuple(self._children[(j + turns) % 4].turned(turns)
+                                  for j in range(4))
+        return self._rotated
+
+    def turned(self, turns: int) -> PersistentBlock:
+        """Return this block rotated clockwise by <turns> quarter turns.
+        """
+        if not self._children or turns % 4 == 0:
+            return self
+        return PersistentBlock(None, self._children, self._turns + turns)
+
+    def __eq__(self, other: PersistentBlock) -> bool:
+        """Return True iff this block and <other> have the same colours and
+        structure.
+        """
+        if self is other:
+            return True
+        if self.colour != other.colour or \
+                len(self._children) != len(other._children):
+            return False
+        return self.children == other.children
+
+
+def _random_children(level: int,
+                     max_depth: int) -> Tuple[PersistentBlock, ...]:
+    """Return four randomly generated children for a block at <level>.
+
+    Random numbers are drawn in the same order as Block.smash, so both produce
+    the same board from the same random seed.
+    """
+    colours = [COLOUR_LIST[random.randint(0, len(COLOUR_LIST) - 1)]
+               for _ in range(4)]
+    children = []
+    for colour in colours:
+        if random.random() < math.exp(-0.25 * (level + 1)) and \
+                level + 1 != max_depth:
+            children.append(PersistentBlock(
+                None, _random_children(level + 1, max_depth)))
+        else:
+            children.append(PersistentBlock(colour))
+    return tuple(children)
+
+
+def _majority_colour(children: Sequence[PersistentBlock]) \
+        -> Optional[Tuple[int, int, int]]:
+    """Return the majority colour of <children>, following the same rules as
+    Block.combine, or None if there is no majority colour.
+    """
+    frequency = {}
+    for child in children:
+        frequency[child.colour] = frequency.get(child.colour, 0) + 1
+    colour = max(frequency, key=frequency.get)
+    if frequency[colour] >= 3 or \
+            (frequency[colour] == 2 and len(frequency) == 3):
+        return colour
+    return None
+
+
+class PersistentBoard:
+    """An immutable Blocky board made of PersistentBlocks.
+
+    Moves never modify a PersistentBoard. PersistentBoard.apply returns a new
+    board instead, which shares every block that the move did not change.
+
+    Blocks are identified by their path: a sequence of child indices that
+    leads from the root to the block. The root's path is ().
+
+    === Public Attributes ===
+    root:
+        The outermost block of this board.
+    max_depth:
+        The deepest level allowed in the board.
+    size:
+        The height and width of the board, in pixels.
+    """
+    root: PersistentBlock
+    max_depth: int
+    size: int
+
+    def __init__(self, root: PersistentBlock, max_depth: int,
+                 size: int) -> None:
+        """Initialize this board with <root>, <max_depth> and <size>.
+        """
+        self.root = root
+        self.max_depth = max_depth
+        self.size = size
+
+    def __eq__(self, other: PersistentBoard) -> bool:
+        """Return True iff this board and <other> describe the same blocks.
+        """
+        return self.max_depth == other.max_depth and \
+            self.size == other.size and self.root == other.root
+
+    def block_at(self, path: Sequence[int]) -> PersistentBlock:
+        """Return the block reached by following <path> from the root.
+
+        Precondition: <path> leads to a block of this board.
+        """
+        block = self.root
+        for index in path:
+            block = block.children[index]
+        return block
+
+    def apply(self, action: Tuple[str, Optional[int]], path: Sequence[int],
+              colour: Optional[Tuple[int, int, int]] = None) \
+            -> Optional[PersistentBoard]:
+        """Return the board that results from performing <action> on the block
+        at <path>, or None if the action could not be performed.
+
+        <action> is one of the actions in actions.py, such as ('rotate', 1),
+        and <colour> is the colour to paint with. The actions follow the same
+        rules as the corresponding Block methods.
+
+        Precondition: <path> leads to a block of this board.
+        """
+        ancestors = [self.root]
+        for index in path:
+            ancestors.append(ancestors[-1].children[index])
+        block = ancestors.pop()
+        level = len(path)
+
+        name, direction = action
+        if name == 'pass':
+            return self
+        elif name == 'rotate' and block.children:
+            new_block = block.turned(direction)
+        elif name == 'swap' and block.children:
+            order = _SWAP_ORDER[direction]
+            new_block = PersistentBlock(None, tuple(block.children[i]
+                                                    for i in order))
+        elif name == 'smash' and not block.children and \
+                level != self.max_depth:
+            new_block = PersistentBlock(
+                None, _random_children(level, self.max_depth))
+        elif name == 'paint' and level == self.max_depth and \
+                colour in COLOUR_LIST and block.colour != colour:
+            new_block = PersistentBlock(colour)
+        elif name == 'combine' and block.children and \
+                level == self.max_depth - 1 and \
+                _majority_colour(block.children) is not None:
+            new_block = PersistentBlock(_majority_colour(block.children))
+        else:
+            return None
+
+        # Copy each ancestor, replacing only the child on the path.
+        for index in reversed(path):
+            parent = ancestors.pop()
+            children = list(parent.children)
+            children[index] = new_block
+            new_block = PersistentBlock(None, tuple(children))
+        return PersistentBoard(new_block, self.max_depth, self.size)
+
+    @staticmethod
+    def from_block(block: Block) -> PersistentBoard:
+        """Return a new PersistentBoard describing the same board as <block>.
+
+        Precondition: <block> is the root of its board (its level is 0).
+        """
+        return PersistentBoard(_freeze(block), block.max_depth, block.size)
+
+    def to_block(self) -> Block:
+        """Return a new Block tree describing the same board as this one.
+        """
+        return _thaw(self.root, (0, 0), self.size, 0, self.max_depth)
+
+
+def _freeze(block: Block) -> PersistentBlock:
+    """Return a PersistentBlock with the same colours and structure as
+    <block>.
+    """
+    if not block.children:
+        return PersistentBlock(block.colour)
+    return PersistentBlock(None, tuple(_freeze(child)
+                                       for child in block.children))
+
+
+def _thaw(block: PersistentBlock, position: Tuple[int, int], size: int,
+          level: int, max_depth: int) -> Block:
+    """Return a new Block tree at <position>, <size> and <level> with the same
+    colours and structure as <block>.
+    """
+    result = Block(position, size, block.colour, level, max_depth)
+    if block.children:
+        # Children are laid out exactly as in Block._children_positions.
+        half = round(size / 2.0)
+        x, y = position
+        positions = [(x + half, y), (x, y), (x, y + half),
+                     (x + half, y + half)]
+        children: List[Block] = []
+        for child, child_position in zip(block.children, positions):
+            children.append(_thaw(child, child_position, half, level + 1,
+                                  max_depth))
+        result.children = children
+    return result
+
+
+def generate_persistent_board(max_depth: int, size: int) -> PersistentBoard:
+    """Return a new randomly generated PersistentBoard with a depth of
+    <max_depth> and dimensions of <size> by <size>.
+
+    Random numbers are drawn in the same order as block.generate_board.
+
+    >>> board = generate_persistent_board(3, 750)
+    >>> board.max_depth
+    3
+    >>> len(board.root.children) == 4
+    True
+    """
+    colour = random.choice(COLOUR_LIST)
+    if max_depth == 0:
+        return PersistentBoard(PersistentBlock(colour), max_depth, size)
+    root = PersistentBlock(None, _random_children(0, max_depth))
+    return PersistentBoard(root, max_depth, size)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'math',
+            'block', 'settings'
+        ],
+        'max-attributes': 15
+    })
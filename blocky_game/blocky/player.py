@@ -2,32 +2,50 @@
 This file contains the hierarchy of player classes.
 """
 from __future__ import annotations
-from typing import List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List, Optional, Tuple
+import math
 import random
-import pygame
+import threading
+import time
 
-from block import Block
+from block import Block, UndoRecord, block_at
+from codec import decode_board, encode_board
 from goal import Goal, generate_goals
 
-from actions import KEY_ACTION, ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE
+from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, PASS, PAINT, COMBINE, ACTION_PENALTY
 
+# An input event for a Player, as a (kind, value) tuple. The kinds are:
+# - ('action', action): the user chose one of the actions in actions.py.
+# - ('level', change): the user moved the selection <change> levels deeper.
+# - ('point', (x, y)): the user pointed at location (x, y) on the board.
+# - ('proceed', None): the user asked an AI player to make its move.
+# controls.py translates pygame events into these.
+PlayerEvent = Tuple[str, Any]
 
-def create_players(num_human: int, num_random: int, smart_players: List[int]) \
-        -> List[Player]:
+
+def create_players(num_human: int, num_random: int, smart_players: List[int],
+                   mcts_players: Optional[List[int]] = None) -> List[Player]:
     """Return a new list of Player objects.
 
     <num_human> is the number of human players, <num_random> is the number of
     random players, and <smart_players> is a list of difficulty levels for each
-    SmartPlayer that is to be created.
+    SmartPlayer that is to be created. <mcts_players>, if given, is a list of
+    the search budgets, in milliseconds, of each MCTSPlayer to be created.
 
     The list should contain <num_human> HumanPlayer objects first, then
     <num_random> RandomPlayer objects, then the same number of SmartPlayer
-    objects as the length of <smart_players>. The difficulty levels in
-    <smart_players> should be applied to each SmartPlayer object, in order.
+    objects as the length of <smart_players>, then the same number of
+    MCTSPlayer objects as the length of <mcts_players>. The difficulty levels
+    in <smart_players> should be applied to each SmartPlayer object, and the
+    budgets in <mcts_players> to each MCTSPlayer object, in order.
     """
-
-    goals = generate_goals(num_human + num_random + len(smart_players))
+    if mcts_players is None:
+        mcts_players = []
+    num_smart = len(smart_players)
+    goals = generate_goals(num_human + num_random + num_smart +
+                           len(mcts_players))
     players = []
 
     for i in range(num_human):
@@ -41,6 +59,10 @@ def create_players(num_human: int, num_random: int, smart_players: List[int]) \
         players.append(SmartPlayer(i, goals[i],
                                    smart_players[i - num_human - num_random]))
 
+    first = num_human + num_random + num_smart
+    for i in range(first, first + len(mcts_players)):
+        players.append(MCTSPlayer(i, goals[i], mcts_players[i - first]))
+
     return players
 
 
@@ -92,14 +114,42 @@ class Player:
     goal:
         This player's assigned goal for the game.
     """
+    # === Private Attributes ===
+    # _progress:
+    #   The fraction of the work on the current move that is done, from 0.0
+    #   to 1.0.
+    # _cancelled:
+    #   Set when the move being chosen is no longer wanted.
     id: int
     goal: Goal
+    _progress: float
+    _cancelled: threading.Event
 
     def __init__(self, player_id: int, goal: Goal) -> None:
         """Initialize this Player.
         """
         self.goal = goal
         self.id = player_id
+        self._progress = 0.0
+        self._cancelled = threading.Event()
+
+    def ready_to_think(self) -> bool:
+        """Return True iff the next call to generate_move will choose a move,
+        which may take long enough that it should run in the background.
+        """
+        return False
+
+    def progress(self) -> float:
+        """Return the fraction of the work on the move being chosen that is
+        done, from 0.0 to 1.0. This may be called from another thread.
+        """
+        return self._progress
+
+    def cancel(self) -> None:
+        """Ask the move being chosen, possibly on another thread, to stop as
+        soon as possible. The interrupted call to generate_move returns None.
+        """
+        self._cancelled.set()
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player.
@@ -108,8 +158,8 @@ class Player:
         """
         raise NotImplementedError
 
-    def process_event(self, event: pygame.event.Event) -> None:
-        """Update this player based on the pygame event.
+    def process_event(self, event: PlayerEvent) -> None:
+        """Update this player based on the input <event>.
         """
         raise NotImplementedError
 
@@ -147,11 +197,15 @@ class HumanPlayer(Player):
     #     The level of the Block that the user selected most recently.
     # _desired_action:
     #     The most recent action that the user is attempting to do.
+    # _location:
+    #     The location on the board that the user pointed at most recently,
+    #     or None if the user has not pointed at the board yet.
     #
     # == Representation Invariants concerning the private attributes ==
     #     _level >= 0
     _level: int
     _desired_action: Optional[Tuple[str, Optional[int]]]
+    _location: Optional[Tuple[int, int]]
 
     def __init__(self, player_id: int, goal: Goal) -> None:
         """Initialize this HumanPlayer with the given <renderer>, <player_id>
@@ -163,32 +217,30 @@ class HumanPlayer(Player):
         # and _selected_block to None.
         self._level = 0
         self._desired_action = None
+        self._location = None
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player based on
-        the position of the mouse on the screen and the player's desired level.
+        the location the player last pointed at and the player's desired level.
 
         If no block is selected by the player, return None.
         """
-        mouse_pos = pygame.mouse.get_pos()
-        block = _get_block(board, mouse_pos, self._level)
-
-        return block
+        if self._location is None:
+            return None
+        return _get_block(board, self._location, self._level)
 
-    def process_event(self, event: pygame.event.Event) -> None:
-        """Respond to the relevant keyboard events made by the player based on
-        the mapping in KEY_ACTION, as well as the W and S keys for changing
-        the level.
-        """
-        if event.type == pygame.KEYDOWN:
-            if event.key in KEY_ACTION:
-                self._desired_action = KEY_ACTION[event.key]
-            elif event.key == pygame.K_w:
-                self._level = max(0, self._level - 1)
-                self._desired_action = None
-            elif event.key == pygame.K_s:
-                self._level += 1
-                self._desired_action = None
+    def process_event(self, event: PlayerEvent) -> None:
+        """Respond to the player choosing an action, changing the level, or
+        pointing at a location on the board.
+        """
+        kind, value = event
+        if kind == 'action':
+            self._desired_action = value
+        elif kind == 'level':
+            self._level = max(0, self._level + value)
+            self._desired_action = None
+        elif kind == 'point':
+            self._location = value
 
     def generate_move(self, board: Block) -> \
             Optional[Tuple[str, Optional[int], Block]]:
@@ -207,66 +259,33 @@ class HumanPlayer(Player):
             return move
 
 
-def _valid_move(player: Player, board: Block, copy: Block) -> \
-        Optional[Tuple[str, Optional[int], Block]]:
-    """Return a valid move <move>, and update the input <executable> to True
-        Precondition: <board_copy> is a copy of <board>.
+def legal_moves(board: Block, colour: Tuple[int, int, int]) -> \
+        Iterator[Tuple[Tuple[str, Optional[int]], Tuple[int, ...]]]:
+    """Yield every distinct move other than PASS that can be successfully
+    performed on <board> by a player whose goal has <colour>.
+
+    Each move is yielded as a pair (action, path), where <action> is one of
+    the actions in actions.py and <path> is the sequence of child indices that
+    leads from <board> to the block being acted on (see block.block_at).
+
+    The moves are found in a single walk of the tree, without mutating it.
     """
-    executable = False
-    while not executable:
-        move1 = random.choice(list(KEY_ACTION.keys())[:-1])
-        move = KEY_ACTION[move1]
-
-        location = (random.randint(copy.position[0],
-                                   copy.position[0] + copy.size - 1),
-                    random.randint(copy.position[0],
-                                   copy.position[0] + copy.size - 1))
-
-        level = random.randint(copy.level, copy.max_depth)
-        block = _get_block(copy, location, level)
-        original_board_block = _get_block(board, location, level)
-
-        if move == COMBINE:
-            if block.combine():
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == SMASH:
-            if block.smash():
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == ROTATE_CLOCKWISE:
-            if block.rotate(1):
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == ROTATE_COUNTER_CLOCKWISE:
-            if block.rotate(3):
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == SWAP_HORIZONTAL:
-            if block.swap(0):
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == SWAP_VERTICAL:
-            if block.swap(1):
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
-
-        if move == PAINT:
-            if block.paint(player.goal.colour):
-                executable = True
-                executed_move = _create_move(move, original_board_block)
-                return executed_move
+    pending = [((), board)]
+    while pending:
+        path, block = pending.pop()
+        if block.children:
+            yield ROTATE_CLOCKWISE, path
+            yield ROTATE_COUNTER_CLOCKWISE, path
+            yield SWAP_HORIZONTAL, path
+            yield SWAP_VERTICAL, path
+            if block.combinable():
+                yield COMBINE, path
+            for i in range(3, -1, -1):
+                pending.append((path + (i,), block.children[i]))
+        elif block.smashable():
+            yield SMASH, path
+        elif block.level == block.max_depth and block.colour != colour:
+            yield PAINT, path
 
 
 class RandomPlayer(Player):
@@ -289,28 +308,60 @@ class RandomPlayer(Player):
         """
         return None
 
-    def process_event(self, event: pygame.event.Event) -> None:
-        """Respond to the left click made by the user to initiate RandomPlayer's
-        move.
+    def ready_to_think(self) -> bool:
+        """Return True iff this player has been asked to make its move.
         """
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        return self._proceed
+
+    def process_event(self, event: PlayerEvent) -> None:
+        """Respond to the user asking RandomPlayer to make its move.
+        """
+        if event[0] == 'proceed':
             self._proceed = True
+            self._progress = 0.0
+            self._cancelled.clear()
 
     def generate_move(self, board: Block) ->\
             Optional[Tuple[str, Optional[int], Block]]:
         """Return a valid, randomly generated move.
 
         A valid move is a move other than PASS that can be successfully
-        performed on the <board>.
+        performed on the <board>. If there is no valid move, return PASS.
 
         This function does not mutate <board>.
         """
         if not self._proceed:
             return None
 
-        copy = board.create_copy()
         self._proceed = False
-        return _valid_move(self, board, copy)
+        moves = list(legal_moves(board, self.goal.colour))
+        if not moves:
+            return _create_move(PASS, board)
+        action, path = random.choice(moves)
+        return _create_move(action, block_at(board, path))
+
+
+def _score_moves(board: bytes, goal: Goal,
+                 moves: List[Tuple[Tuple[str, Optional[int]], Tuple[int, ...]]],
+                 seed: int) -> List[int]:
+    """Return the score of <goal> after each of <moves> is applied on its own
+    to <board>, in the same order as <moves>.
+
+    This function runs in a SmartPlayer's worker processes, which receive
+    <board> encoded by codec.encode_board. The random number
+    generator is seeded with <seed> + i before the i-th move is applied, so
+    the scores of smashes do not depend on how moves are split between
+    workers.
+    """
+    block = decode_board(board)
+    scores = []
+    for i, (action, path) in enumerate(moves):
+        random.seed(seed + i)
+        target = block_at(block, path)
+        record = target.apply(action, goal.colour)
+        scores.append(goal.score(block))
+        target.undo(record)
+    return scores
 
 
 class SmartPlayer(Player):
@@ -319,20 +370,40 @@ class SmartPlayer(Player):
     # === Public Attributes ===
     # difficulty:
     #   The level of difficulty of the SmartPlayer AI.
+    # workers:
+    #   The number of processes used to score candidate moves. If it is 0 or
+    #   1, candidates are scored in this process.
 
     # === Private Attributes ===
     # _proceed:
     #   True when the player should make a move, False when the player should
     #   wait.
+    # _pool:
+    #   The pool of worker processes, or None if it has not been started.
     _proceed: bool
     difficulty: int
+    workers: int
+    _pool: Optional[ProcessPoolExecutor]
 
-    def __init__(self, player_id: int, goal: Goal, difficulty: int) -> None:
+    def __init__(self, player_id: int, goal: Goal, difficulty: int,
+                 workers: int = 0) -> None:
         """Initialize this RandomPlayer with the given <renderer>, <player_id>,
-        <goal>, and <difficulty>."""
+        <goal>, and <difficulty>.
+
+        If <workers> is greater than 1, candidate moves are scored in a pool of
+        that many worker processes."""
         Player.__init__(self, player_id, goal)
         self.difficulty = difficulty
+        self.workers = workers
         self._proceed = False
+        self._pool = None
+
+    def close(self) -> None:
+        """Shut down this player's worker processes, if they were started.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
 
     def get_selected_block(self, board: Block) -> Optional[Block]:
         """Return the block that is currently selected by the player.
@@ -340,12 +411,18 @@ class SmartPlayer(Player):
         """
         return None
 
-    def process_event(self, event: pygame.event.Event) -> None:
-        """Respond to the left click made by the user to initiate SmartPlayer's
-        move.
+    def ready_to_think(self) -> bool:
+        """Return True iff this player has been asked to make its move.
         """
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        return self._proceed
+
+    def process_event(self, event: PlayerEvent) -> None:
+        """Respond to the user asking SmartPlayer to make its move.
+        """
+        if event[0] == 'proceed':
             self._proceed = True
+            self._progress = 0.0
+            self._cancelled.clear()
 
     def generate_move(self, board: Block) ->\
             Optional[Tuple[str, Optional[int], Block]]:
@@ -355,7 +432,8 @@ class SmartPlayer(Player):
 
         A valid move is a move other than PASS that can be successfully
         performed on the <board>. If no move can be found that is better than
-        the current score, this player will pass.
+        the current score, this player will pass. Return None if the move is
+        cancelled before it is chosen.
 
         This function does not mutate <board>.
         """
@@ -365,19 +443,397 @@ class SmartPlayer(Player):
         original_score = self.goal.score(board)
         optimal_score = 0
         optimal_move = None
-        for _ in range(self.difficulty):
-            copy = board.create_copy()
-            x = _valid_move(self, board, copy)
-            score = self.goal.score(copy)
+        moves = list(legal_moves(board, self.goal.colour))
+        candidates = random.sample(moves, min(self.difficulty, len(moves)))
+        # Candidates are compared in order, so the first of several moves
+        # with the highest score is chosen wherever they were scored.
+        for (action, path), score in zip(candidates,
+                                         self._score(board, candidates)):
             if score > optimal_score:
                 optimal_score = score
-                optimal_move = x
+                optimal_move = _create_move(action, block_at(board, path))
 
         self._proceed = False  # Must set to False before returning!
+        if self._cancelled.is_set():
+            return None
         if original_score >= optimal_score:
             return _create_move(PASS, board)
         return optimal_move
 
+    def _score(self, board: Block,
+               moves: List[Tuple[Tuple[str, Optional[int]], Tuple[int, ...]]]) \
+            -> List[int]:
+        """Return the score of this player's goal after each of <moves> is
+        applied on its own to <board>, in the same order as <moves>. If the
+        move is cancelled, fewer scores are returned.
+
+        If this player has more than one worker, the moves are split into one
+        contiguous chunk per worker, and <board> is sent to the workers in the
+        compact encoding of codec.py.
+        """
+        if self.workers <= 1 or len(moves) < 2:
+            scores = []
+            for action, path in moves:
+                if self._cancelled.is_set():
+                    break
+                # Evaluate each candidate on <board> itself, then undo it.
+                block = block_at(board, path)
+                record = block.apply(action, self.goal.colour)
+                scores.append(self.goal.score(board))
+                block.undo(record)
+                self._progress = len(scores) / len(moves)
+            return scores
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        encoded = encode_board(board)
+        seed = random.getrandbits(32)
+        chunk = -(-len(moves) // self.workers)
+        futures = [self._pool.submit(_score_moves, encoded, self.goal,
+                                     moves[start:start + chunk], seed + start)
+                   for start in range(0, len(moves), chunk)]
+        scores = []
+        for future in futures:
+            if self._cancelled.is_set():
+                future.cancel()
+                continue
+            scores.extend(future.result())
+            self._progress = len(scores) / len(moves)
+        return scores
+
+
+def _replay_move(board: Block,
+                 move: Tuple[Tuple[str, Optional[int]], Tuple[int, ...]],
+                 colour: Tuple[int, int, int],
+                 journal: List[Tuple[Block, UndoRecord]]) -> bool:
+    """Apply <move>, an (action, path) pair, to <board> and record how to undo
+    it in <journal>.
+
+    Return False, without mutating <board>, if <move> cannot be performed,
+    which happens when a smash earlier in the search created different
+    children than it did when <move> was found.
+    """
+    action, path = move
+    block = board
+    for index in path:
+        if not block.children:
+            return False
+        block = block.children[index]
+    record = block.apply(action, colour)
+    if record is None:
+        return False
+    journal.append((block, record))
+    return True
+
+
+class _SearchNode:
+    """A node in the search tree of an MCTSPlayer. It stands for the board
+    reached by applying the moves on the path from the root to this node.
+
+    === Public Attributes ===
+    move:
+        The (action, path) pair applied to reach this node from its parent, or
+        None if this node is the root.
+    children:
+        The nodes that have been expanded from this node.
+    untried:
+        The legal moves from this node that have not been expanded yet, or
+        None if they have not been listed yet.
+    visits:
+        The number of search iterations that passed through this node.
+    total:
+        The sum of the rewards of those iterations.
+    """
+    move: Optional[Tuple[Tuple[str, Optional[int]], Tuple[int, ...]]]
+    children: List[_SearchNode]
+    untried: Optional[List[Tuple[Tuple[str, Optional[int]],
+                                 Tuple[int, ...]]]]
+    visits: int
+    total: float
+
+    def __init__(self, move: Optional[Tuple[Tuple[str, Optional[int]],
+                                            Tuple[int, ...]]]) -> None:
+        """Initialize this node, reached by <move>, with no visits.
+        """
+        self.move = move
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.total = 0.0
+
+    def rebase(self, amount: float) -> None:
+        """Add <amount> to the reward of every iteration through this node
+        and through each of its descendants.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.total += amount * node.visits
+            stack.extend(node.children)
+
+    def mean(self) -> float:
+        """Return the mean reward of the iterations through this node.
+
+        Precondition: this node has been visited.
+        """
+        return self.total / self.visits
+
+    def select(self, exploration: float, low: float,
+               high: float) -> _SearchNode:
+        """Return the child of this node with the highest UCT value, using the
+        exploration constant <exploration>.
+
+        The mean rewards are normalised to lie between 0 and 1, where <low>
+        and <high> are the lowest and highest rewards seen so far.
+
+        Precondition: this node has at least one child.
+        """
+        log_visits = math.log(self.visits)
+        scale = max(1.0, high - low)
+        best = None
+        best_value = -math.inf
+        for child in self.children:
+            value = (child.mean() - low) / scale + \
+                exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best = child
+                best_value = value
+        return best
+
+
+class MCTSPlayer(Player):
+    """An AI that chooses its moves with a Monte Carlo tree search, stopping
+    after a fixed amount of wall-clock time rather than a number of samples.
+
+    The search only looks at this player's own moves. The reward of a line of
+    play is the best goal score reached along it, minus the penalties of the
+    moves played.
+    """
+    # === Public Attributes ===
+    # budget_ms:
+    #   The number of milliseconds spent searching for each move.
+    # rollout_depth:
+    #   The number of random moves played after each newly expanded node.
+    # exploration:
+    #   The UCT exploration constant, for rewards normalised to lie between 0
+    #   and 1.
+
+    # === Private Attributes ===
+    # _proceed:
+    #   True when the player should make a move, False when the player should
+    #   wait.
+    # _root:
+    #   The search tree kept from the previous turn, or None.
+    # _expected:
+    #   The structure hash of the board that _root was searched for, or None.
+    # _bounds:
+    #   The lowest and highest rewards seen by the current search.
+    _proceed: bool
+    budget_ms: int
+    rollout_depth: int
+    exploration: float
+    _root: Optional[_SearchNode]
+    _expected: Optional[int]
+    _bounds: List[float]
+
+    def __init__(self, player_id: int, goal: Goal, budget_ms: int,
+                 rollout_depth: int = 2, exploration: float = 1.4) -> None:
+        """Initialize this MCTSPlayer with the given <player_id>, <goal>,
+        <budget_ms>, <rollout_depth> and <exploration>."""
+        Player.__init__(self, player_id, goal)
+        self.budget_ms = budget_ms
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self._proceed = False
+        self._root = None
+        self._expected = None
+        self._bounds = [0.0, 0.0]
+
+    def get_selected_block(self, board: Block) -> Optional[Block]:
+        """Return the block that is currently selected by the player.
+        For MCTSPlayer, this should always return None.
+        """
+        return None
+
+    def ready_to_think(self) -> bool:
+        """Return True iff this player has been asked to make its move.
+        """
+        return self._proceed
+
+    def process_event(self, event: PlayerEvent) -> None:
+        """Respond to the user asking MCTSPlayer to make its move.
+        """
+        if event[0] == 'proceed':
+            self._proceed = True
+            self._progress = 0.0
+            self._cancelled.clear()
+
+    def generate_move(self, board: Block) ->\
+            Optional[Tuple[str, Optional[int], Block]]:
+        """Return the move that was visited most often by a search lasting
+        budget_ms milliseconds, breaking ties by mean reward, or PASS if that
+        move is not expected to beat the current score.
+
+        The moves from <board> are first scored once each, in a random order,
+        and the tree search below them only starts once all of them have
+        been. The search stops when the budget runs out, even if some moves
+        were never scored, so each call takes about budget_ms milliseconds
+        however large the board is.
+
+        If <board> is exactly the board that the move chosen last turn led
+        to, which is only the case if no other player has changed it since,
+        the search continues from that part of last turn's tree. Return None
+        if the move is cancelled before it is chosen.
+
+        This function does not mutate <board>.
+
+        >>> from block import generate_board
+        >>> from goal import BlobGoal
+        >>> from settings import COLOUR_LIST
+        >>> random.seed(7)
+        >>> board = generate_board(7, 750)
+        >>> player = MCTSPlayer(0, BlobGoal(COLOUR_LIST[0]), 50)
+        >>> player.process_event(('proceed', None))
+        >>> start = time.perf_counter()
+        >>> move = player.generate_move(board)
+        >>> time.perf_counter() - start < 0.05 + 0.05
+        True
+        """
+        if not self._proceed:
+            return None
+        self._proceed = False
+
+        start = time.perf_counter()
+        budget = self.budget_ms / 1000
+        if self._root is None or self._expected != board.structure_hash():
+            self._root = _SearchNode(None)
+        root = self._root
+        current = self.goal.score(board)
+        self._bounds = [current, current]
+        for child in root.children:
+            self._record(child.mean())
+        if root.untried is None:
+            root.untried = list(legal_moves(board, self.goal.colour))
+            random.shuffle(root.untried)
+        while root.untried or root.children:
+            if root.untried:
+                self._expand(board, root)
+            else:
+                self._search(board, root)
+            elapsed = time.perf_counter() - start
+            self._progress = min(1.0, elapsed / budget) if budget else 1.0
+            if elapsed >= budget:
+                break
+            if self._cancelled.is_set():
+                return None
+
+        best = None
+        if root.children:
+            best = max(root.children,
+                       key=lambda child: (child.visits, child.mean()))
+        if best is None or best.mean() <= current:
+            self._expected = board.structure_hash()
+            return _create_move(PASS, board)
+
+        action, path = best.move
+        block = block_at(board, path)
+        if action == SMASH:
+            # The smash will create different children than the search saw.
+            self._root = None
+        else:
+            record = block.apply(action, self.goal.colour)
+            self._expected = board.structure_hash()
+            block.undo(record)
+            # The rewards below <best> were counted from the old root, so
+            # they include the penalty of its move, which is now made.
+            best.rebase(ACTION_PENALTY[action])
+            best.move = None
+            self._root = best
+        return _create_move(action, block)
+
+    def _expand(self, board: Block, root: _SearchNode) -> None:
+        """Expand the next untried move from <root> on <board>, scoring it
+        once without a rollout, and restore <board> before returning.
+
+        Precondition: <root> has an untried move.
+        """
+        colour = self.goal.colour
+        move = root.untried.pop()
+        journal = []
+        if not _replay_move(board, move, colour, journal):
+            return
+        reward = self.goal.score(board) - ACTION_PENALTY[move[0]]
+        for block, record in reversed(journal):
+            block.undo(record)
+        self._record(reward)
+        child = _SearchNode(move)
+        child.visits = 1
+        child.total = reward
+        root.children.append(child)
+        root.visits += 1
+        root.total += reward
+
+    def _record(self, reward: float) -> None:
+        """Widen the bounds of the rewards seen by this search to include
+        <reward>.
+        """
+        self._bounds[0] = min(self._bounds[0], reward)
+        self._bounds[1] = max(self._bounds[1], reward)
+
+    def _search(self, board: Block, root: _SearchNode) -> None:
+        """Run one iteration of the search from <root> on <board>, and restore
+        <board> before returning.
+
+        Precondition: every move from <root> has been expanded.
+        """
+        colour = self.goal.colour
+        journal = []
+        visited = [root]
+        node = root
+        penalty = 0
+        reached = True
+
+        # Select a path through the fully expanded part of the tree.
+        while node.untried is not None and not node.untried and \
+                node.children:
+            node = node.select(self.exploration, *self._bounds)
+            if not _replay_move(board, node.move, colour, journal):
+                reached = False
+                break
+            visited.append(node)
+            penalty += ACTION_PENALTY[node.move[0]]
+
+        # Expand one untried move.
+        if reached:
+            if node.untried is None:
+                node.untried = list(legal_moves(board, colour))
+                random.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                if _replay_move(board, move, colour, journal):
+                    child = _SearchNode(move)
+                    node.children.append(child)
+                    visited.append(child)
+                    penalty += ACTION_PENALTY[move[0]]
+
+        # Play random moves, keeping the best reward seen along the way.
+        reward = self.goal.score(board) - penalty
+        for _ in range(self.rollout_depth):
+            moves = list(legal_moves(board, colour))
+            if not moves:
+                break
+            move = random.choice(moves)
+            _replay_move(board, move, colour, journal)
+            penalty += ACTION_PENALTY[move[0]]
+            reward = max(reward, self.goal.score(board) - penalty)
+
+        for block, record in reversed(journal):
+            block.undo(record)
+        self._record(reward)
+        for node in visited:
+            node.visits += 1
+            node.total += reward
+
 
 if __name__ == '__main__':
     import python_ta
@@ -386,8 +842,8 @@ if __name__ == '__main__':
         'allowed-io': ['process_event'],
         'allowed-import-modules': [
             'doctest', 'python_ta', 'random', 'typing', 'actions', 'block',
-            'goal', 'pygame', '__future__'
+            'goal', '__future__', 'codec', 'concurrent.futures',
+            'math', 'threading', 'time'
         ],
-        'max-attributes': 10,
-        'generated-members': 'pygame.*'
+        'max-attributes': 11
     })
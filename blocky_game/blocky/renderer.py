@@ -21,27 +21,34 @@ Misha Schwartz, and Jaisie Sin.
 
 This file contains the class that "renders" the image of our game.
 """
-from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Tuple, Optional
 import pygame
 
 from actions import ROTATE_CLOCKWISE, ROTATE_COUNTER_CLOCKWISE,\
-    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, ACTION_KEY, ACTION_LABEL, COMBINE,\
-    PAINT, PASS
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, ACTION_LABEL, COMBINE, PAINT, PASS
+from controls import ACTION_KEY
 from settings import BACKGROUND_COLOUR, TEXT_COLOUR, OUTLINE_THICKNESS, \
     OUTLINE_COLOUR, HIGHLIGHT_THICKNESS, HIGHLIGHT_COLOUR, COLOUR_LIST, \
     colour_name
 
 Y_FONT_PADDING = 2
 
+# The maximum number of scaled action images kept by a Renderer
+ICON_CACHE_SIZE = 128
+
 
 def _load_image(path_to_file: str) -> pygame.Surface:
     """
     Load an image from <path_to_file>.
 
+    The image is converted to the pixel format of the display, so the display
+    must already be set up.
+
     If an error occurs, print it before exiting the program.
     """
     try:
-        image = pygame.image.load(path_to_file)
+        image = pygame.image.load(path_to_file).convert_alpha()
     except pygame.error as e:
         # Avoid outputting the stack trace, just show the error
         print('ERROR: ', e)
@@ -139,6 +146,17 @@ def _print_instructions(screen: pygame.Surface,
     return image
 
 
+def _draw_squares(surface: pygame.Surface,
+                  squares: List[Tuple[Tuple[int, int, int], Tuple[int, int],
+                                      int]]) -> None:
+    """Draw each of <squares> onto <surface>, with an outline.
+    """
+    for colour, pos, size in squares:
+        rect = (pos[0], pos[1], size, size)
+        pygame.draw.rect(surface, colour, rect, 0)
+        pygame.draw.rect(surface, OUTLINE_COLOUR, rect, OUTLINE_THICKNESS)
+
+
 class Renderer:
     """
     A class designed to handle drawing the different aspects of a Blocky game.
@@ -150,11 +168,41 @@ class Renderer:
     #   The font to use for text being drawn.
     # _images:
     #   A dictionary mapping actions to images that are displayed in the game.
+    # _icons:
+    #   The images of _images already scaled to a size, keyed by
+    #   (action, size), from least to most recently used.
     # _status_position:
     #   The (x, y) position of the status messages.
+    # _board_surface:
+    #   An off-screen image of the board, which is copied to the screen in
+    #   every frame instead of drawing each square again.
+    # _board_version:
+    #   The version of the board drawn on _board_surface, or None if nothing
+    #   has been drawn on it yet.
+    # _board_changes:
+    #   The areas of _board_surface that have changed since it was last drawn
+    #   onto the screen.
+    # _frame_rects:
+    #   The areas of the screen drawn on since the last call to present().
+    # _last_rects:
+    #   The areas of the screen drawn on in the frame before that.
+    # _board_drawn:
+    #   Whether the board has been drawn onto the screen since the last call
+    #   to present().
+    # _board_drawn_last:
+    #   Whether the board was drawn onto the screen in the frame before that,
+    #   or None if no frame has been presented yet.
     _screen: pygame.Surface
+    _board_surface: pygame.Surface
+    _board_version: Optional[Hashable]
+    _board_changes: List[pygame.Rect]
+    _frame_rects: List[pygame.Rect]
+    _last_rects: List[pygame.Rect]
+    _board_drawn: bool
+    _board_drawn_last: Optional[bool]
     _instructions: pygame.Surface
     _images: Dict[Tuple[str, Optional[int]], pygame.Surface]
+    _icons: OrderedDict
     _font: pygame.font.Font
     _status_position: Tuple[int, int]
     _clear_rect: Tuple[Tuple[int, int], Tuple[int, int]]
@@ -176,6 +224,14 @@ class Renderer:
         self._status_position = (10, size + Y_FONT_PADDING)
         self._clear_rect = ((0, 0), (size, height))
 
+        self._board_surface = pygame.Surface((size, size)).convert()
+        self._board_version = None
+        self._board_changes = []
+        self._frame_rects = []
+        self._last_rects = []
+        self._board_drawn = False
+        self._board_drawn_last = None
+
         self._images = {
             ROTATE_CLOCKWISE: _load_image('images/rotate-cw.png'),
             ROTATE_COUNTER_CLOCKWISE: _load_image('images/rotate-ccw.png'),
@@ -186,6 +242,7 @@ class Renderer:
             PAINT: _load_image('images/paint.png'),
             PASS: _load_image('images/pass.png')
         }
+        self._icons = OrderedDict()
 
     def clear(self) -> None:
         """Clear the screen with BACKGROUND_COLOUR.
@@ -200,26 +257,96 @@ class Renderer:
         If the action is not supported, no image is drawn.
         """
         if action in self._images:
-            image = self._images[action]
-            image = pygame.transform.scale(image, (size, size))
-            self._screen.blit(image, pos)
+            image = self._scaled_image(action, size)
+            self._frame_rects.append(self._screen.blit(image, pos))
+
+    def _scaled_image(self, action: Tuple[str, Optional[int]],
+                      size: int) -> pygame.Surface:
+        """Return the image for <action> scaled to <size> x <size>, scaling it
+        only if it is not already cached.
+
+        Precondition: action in self._images
+        """
+        key = (action, size)
+        if key in self._icons:
+            self._icons.move_to_end(key)
+        else:
+            self._icons[key] = pygame.transform.scale(
+                self._images[action], (size, size))
+            if len(self._icons) > ICON_CACHE_SIZE:
+                self._icons.popitem(last=False)
+        return self._icons[key]
+
+    def preload_images(self, size: int, max_depth: int) -> None:
+        """Scale every action image to the size of a block at each level of a
+        <size> x <size> board with <max_depth>, so that no image has to be
+        scaled while a move is animated.
+        """
+        for _ in range(max_depth + 1):
+            for action in self._images:
+                self._scaled_image(action, size)
+            # Blocks halve in size at each level, as in Block._child_size.
+            size = round(size / 2.0)
 
     def draw_board(self, squares: List[Tuple[Tuple[int, int, int],
                                              Tuple[int, int], int]]) -> None:
         """Draw each block in blocks onto the screen.
         """
-        for colour, pos, size in squares:
-            rect = (pos[0], pos[1], size, size)
-            pygame.draw.rect(self._screen, colour, rect, 0)
-            pygame.draw.rect(self._screen, OUTLINE_COLOUR, rect,
-                             OUTLINE_THICKNESS)
+        _draw_squares(self._screen, squares)
+        self._frame_rects.append(self._board_surface.get_rect())
+        self._board_drawn = True
+
+    def has_board(self, version: Hashable) -> bool:
+        """Return True iff the cached board image shows the board <version>.
+        """
+        return self._board_version == version
+
+    def cache_board(self, squares: List[Tuple[Tuple[int, int, int],
+                                              Tuple[int, int], int]],
+                    version: Hashable) -> None:
+        """Redraw the cached board image from <squares>, and record that it
+        shows the board <version>.
+
+        <version> can be any value that changes whenever the board does.
+        """
+        self._board_surface.fill(BACKGROUND_COLOUR)
+        _draw_squares(self._board_surface, squares)
+        self._board_version = version
+        self._board_changes = [self._board_surface.get_rect()]
+
+    def cache_region(self, squares: List[Tuple[Tuple[int, int, int],
+                                               Tuple[int, int], int]],
+                     pos: Tuple[int, int], size: int,
+                     version: Hashable) -> None:
+        """Redraw only the <size> x <size> square at <pos> of the cached board
+        image from <squares>, and record that it now shows the board
+        <version>.
+
+        Precondition: the rest of the cached image already shows the board
+        <version>, and <squares> cover the whole square at <pos>.
+        """
+        rect = pygame.Rect(pos, (size, size))
+        self._board_surface.set_clip(rect)
+        self._board_surface.fill(BACKGROUND_COLOUR, rect)
+        _draw_squares(self._board_surface, squares)
+        self._board_surface.set_clip(None)
+        self._board_version = version
+        self._board_changes.append(rect)
+
+    def draw_cached_board(self) -> None:
+        """Draw the cached board image onto the screen.
+        """
+        self._screen.blit(self._board_surface, (0, 0))
+        self._frame_rects.extend(self._board_changes)
+        self._board_changes = []
+        self._board_drawn = True
 
     def highlight_block(self, pos: Tuple[int, int], size: int) -> None:
         """Draw a highlighted square border at pos with size.
         """
         rect = (pos[0], pos[1], size, size)
-        pygame.draw.rect(self._screen, HIGHLIGHT_COLOUR, rect,
-                         HIGHLIGHT_THICKNESS)
+        self._frame_rects.append(pygame.draw.rect(
+            self._screen, HIGHLIGHT_COLOUR, rect, HIGHLIGHT_THICKNESS))
 
     def text_height(self) -> int:
         """Return the height between lines of text in pixels.
@@ -230,12 +357,30 @@ class Renderer:
         """Print <text> to the (<x>, <y>) location on the screen.
         """
         _print_to_image(text, x, y, self._font, self._screen)
+        self._frame_rects.append(pygame.Rect((x, y), self._font.size(text)))
 
     def draw_status(self, message: str) -> None:
         """Draw the current status of the game.
         """
         surface = self._font.render(message, 1, TEXT_COLOUR)
-        self._screen.blit(surface, self._status_position)
+        self._frame_rects.append(
+            self._screen.blit(surface, self._status_position))
+
+    def present(self) -> None:
+        """Show everything drawn since the last call on the display.
+
+        Only the areas drawn in this frame or the previous one are sent to the
+        display, unless the board appeared or disappeared, in which case the
+        whole display is updated.
+        """
+        if self._board_drawn != self._board_drawn_last:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._frame_rects + self._last_rects)
+        self._board_drawn_last = self._board_drawn
+        self._board_drawn = False
+        self._last_rects = self._frame_rects
+        self._frame_rects = []
 
     def save_to_file(self, filename: str) -> None:
         """Save the current graphics on the screen to a file named <filename>.
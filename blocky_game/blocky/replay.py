@@ -0,0 +1,202 @@
+"""
+This file contains GameLog, which records a game of Blocky as it is played,
+and Replay, which rebuilds the board at any point of a recorded game without
+rendering it.
+
+A log is a JSON-lines file, written append-only. Its first line describes the
+game: the random seed, the board's max_depth and size, and each player's
+goal. Each later line is either a move or a checkpoint. A move holds the
+player, the action, the path of the block it acted on, and the random seed
+the move was played with, so that a smash creates the same children when it
+is replayed. A checkpoint holds the board after a number of moves, encoded by
+codec.py, so that a replay never has to apply more than a few moves.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, TextIO, Tuple
+import json
+import random
+
+from block import Block, block_at
+from codec import decode_board, encode_board
+from goal import BlobGoal, Goal, PerimeterGoal
+
+# The goal classes that can be recorded, by name
+_GOALS = {'PerimeterGoal': PerimeterGoal, 'BlobGoal': BlobGoal}
+
+
+def move_seed(game_seed: int, index: int) -> int:
+    """Return the random seed used to play move number <index> of the game
+    with <game_seed>.
+    """
+    return (game_seed << 32) | index
+
+
+class GameLog:
+    """A log that a game of Blocky is recorded to as it is played.
+
+    === Public Attributes ===
+    seed:
+        The random seed of the game.
+    moves:
+        The number of moves recorded so far.
+    checkpoint_interval:
+        The number of moves between checkpoints.
+    """
+    # === Private Attributes ===
+    # _file:
+    #   The log file, open for writing.
+    seed: int
+    moves: int
+    checkpoint_interval: int
+    _file: TextIO
+
+    def __init__(self, path: str, seed: int, board: Block,
+                 goals: Sequence[Goal], checkpoint_interval: int = 20) -> None:
+        """Start a log at <path> for a game with the random <seed>, played on
+        <board> by players with <goals>, in the order of their IDs.
+
+        The log begins with a checkpoint of <board>.
+        """
+        self.seed = seed
+        self.moves = 0
+        self.checkpoint_interval = checkpoint_interval
+        self._file = open(path, 'w')
+        self._write({
+            'type': 'game',
+            'seed': seed,
+            'max_depth': board.max_depth,
+            'size': board.size,
+            'goals': [[type(goal).__name__, list(goal.colour)]
+                      for goal in goals]
+        })
+        self._checkpoint(board)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Append <record> to the log as one line, and flush it, so that the
+        log is complete up to the last move even if the game crashes.
+        """
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def _checkpoint(self, board: Block) -> None:
+        """Record <board> as it is after the moves recorded so far."""
+        self._write({'type': 'checkpoint', 'move': self.moves,
+                     'board': encode_board(board).hex()})
+
+    def next_seed(self) -> int:
+        """Return the random seed that the next move must be played with."""
+        return move_seed(self.seed, self.moves)
+
+    def record(self, player_id: int, action: Tuple[str, Optional[int]],
+               path: Sequence[int], board: Block) -> None:
+        """Record that the player with <player_id> performed <action> on the
+        block at <path>, leaving <board>, with the seed from next_seed().
+        """
+        self._write({'type': 'move', 'player': player_id,
+                     'action': list(action), 'path': list(path),
+                     'seed': self.next_seed()})
+        self.moves += 1
+        if self.moves % self.checkpoint_interval == 0:
+            self._checkpoint(board)
+
+    def close(self) -> None:
+        """Close the log file."""
+        self._file.close()
+
+
+class Replay:
+    """A recorded game of Blocky, read from a log written by GameLog.
+
+    === Public Attributes ===
+    seed:
+        The random seed of the game.
+    goals:
+        The goal of each player, in the order of their IDs.
+    """
+    # === Private Attributes ===
+    # _moves:
+    #   Each move, as a (player ID, action, path, seed) tuple.
+    # _checkpoints:
+    #   The encoded board after each checkpointed number of moves.
+    seed: int
+    goals: List[Goal]
+    _moves: List[Tuple[int, Tuple[str, Optional[int]], Tuple[int, ...], int]]
+    _checkpoints: Dict[int, bytes]
+
+    def __init__(self, path: str) -> None:
+        """Read the log at <path>.
+
+        A last line that was only partly written is ignored. Raise
+        ValueError if the file is not a game log.
+        """
+        self._moves = []
+        self._checkpoints = {}
+        with open(path) as file:
+            lines = file.readlines()
+        if lines and not lines[-1].endswith('\n'):
+            lines.pop()
+        if not lines:
+            raise ValueError(f'{path} is not a game log')
+        header = json.loads(lines[0])
+        if header.get('type') != 'game':
+            raise ValueError(f'{path} is not a game log')
+        self.seed = header['seed']
+        self.goals = [_GOALS[name](tuple(colour))
+                      for name, colour in header['goals']]
+        for line in lines[1:]:
+            record = json.loads(line)
+            if record['type'] == 'move':
+                self._moves.append((record['player'], tuple(record['action']),
+                                    tuple(record['path']), record['seed']))
+            elif record['type'] == 'checkpoint':
+                self._checkpoints[record['move']] = \
+                    bytes.fromhex(record['board'])
+
+    def __len__(self) -> int:
+        """Return the number of moves in this replay."""
+        return len(self._moves)
+
+    def turns(self) -> int:
+        """Return the number of turns started in this replay."""
+        return -(-len(self._moves) // len(self.goals))
+
+    def moves(self) -> List[Tuple[int, Tuple[str, Optional[int]],
+                                  Tuple[int, ...]]]:
+        """Return each move as a (player ID, action, path) tuple."""
+        return [(player, action, path)
+                for player, action, path, _ in self._moves]
+
+    def board_after(self, count: int) -> Block:
+        """Return the board after the first <count> moves, starting from the
+        closest checkpoint before it.
+
+        Precondition: 0 <= count <= len(self)
+        """
+        start = max(move for move in self._checkpoints if move <= count)
+        board = decode_board(self._checkpoints[start])
+        state = random.getstate()
+        try:
+            for player, action, path, seed in self._moves[start:count]:
+                random.seed(seed)
+                block_at(board, path).apply(action, self.goals[player].colour)
+        finally:
+            random.setstate(state)
+        return board
+
+    def board_at_turn(self, turn: int) -> Block:
+        """Return the board at the start of <turn>, counting from 0, or at the
+        end of the game if it has fewer turns.
+        """
+        return self.board_after(min(len(self._moves),
+                                    turn * len(self.goals)))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['__init__'],
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'random', 'typing', '__future__', 'json',
+            'block', 'codec', 'goal'
+        ]
+    })
@@ -0,0 +1,257 @@
+"""
+This file contains a tournament runner, which plays many headless games of
+Blocky between AI players in a pool of processes and reports statistics about
+the results.
+
+Every game is played with its own random seed, derived from the tournament's
+seed and the game's number, so a tournament can be reproduced exactly,
+unless it has MCTS players: their searches stop after a fixed amount of
+wall-clock time, so their moves depend on how fast the machine is.
+
+Run it from the command line, for example:
+
+    python tournament.py --games 200 --random 1 --smart 5 10 --workers 4
+
+    python tournament.py --games 50 --smart 100 --mcts 60
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import json
+import random
+import statistics
+import time
+
+from block import generate_board
+from corpus import Corpus
+from engine import GameData, HeadlessGame
+from player import create_players
+from settings import BOARD_SIZE, COLOUR_LIST
+
+# The corpora opened by this process, keyed by path
+_corpora: Dict[str, Corpus] = {}
+
+
+def _percentile(values: Sequence[float], percent: float) -> float:
+    """Return the <percent>th percentile of <values>, using the nearest-rank
+    method, or 0.0 if <values> is empty.
+
+    >>> _percentile([4, 1, 3, 2], 50)
+    2
+    >>> _percentile([4, 1, 3, 2], 99)
+    4
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _load_corpus(path: str) -> Corpus:
+    """Return the corpus at <path>, opening it only once per process.
+
+    Raise ValueError if the corpus holds no boards.
+    """
+    if path not in _corpora:
+        corpus = Corpus(path)
+        if len(corpus) == 0:
+            corpus.close()
+            raise ValueError(f'the corpus {path} contains no boards')
+        _corpora[path] = corpus
+    return _corpora[path]
+
+
+def lineup_labels(num_random: int, smart_players: List[int],
+                  mcts_players: Optional[List[int]] = None) -> List[str]:
+    """Return a label for each player created by
+    create_players(0, <num_random>, <smart_players>, <mcts_players>), in order.
+    """
+    return ['Random'] * num_random + \
+        [f'Smart({level})' for level in smart_players] + \
+        [f'MCTS({budget}ms)' for budget in mcts_players or []]
+
+
+def play_game(seed: int, max_depth: int, num_turns: int, num_random: int,
+              smart_players: List[int], corpus_path: Optional[str] = None,
+              mcts_players: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Play one headless game with the random seed <seed>, and return its
+    results.
+
+    The board is generated with <max_depth>, or, if <corpus_path> is given,
+    it is board number <seed> (modulo its length) of that corpus. The
+    players are created by
+    create_players(0, <num_random>, <smart_players>, <mcts_players>).
+    The results hold each player's final score, the index of the winning
+    player, and each player's think times in seconds.
+    """
+    random.seed(seed)
+    if corpus_path is None:
+        board = generate_board(max_depth, BOARD_SIZE)
+    else:
+        corpus = _load_corpus(corpus_path)
+        board = corpus.board(seed % len(corpus))
+    players = create_players(0, num_random, smart_players, mcts_players)
+    game = HeadlessGame(GameData(board, players))
+    scores = [goal_score - penalty
+              for _, goal_score, penalty in game.run(num_turns)]
+    for player in players:
+        if hasattr(player, 'close'):
+            player.close()
+    return {
+        'seed': seed,
+        'scores': scores,
+        # As in GameOverState, the first of several tied players wins.
+        'winner': scores.index(max(scores)),
+        'think_times': [game.think_times[player.id] for player in players]
+    }
+
+
+def _play_game(args: tuple) -> Dict[str, Any]:
+    """Call play_game with the arguments in <args>, so that it can be used
+    with ProcessPoolExecutor.map.
+    """
+    return play_game(*args)
+
+
+def run_tournament(num_games: int, max_depth: int, num_turns: int,
+                   num_random: int, smart_players: List[int], seed: int = 0,
+                   workers: int = 1, corpus_path: Optional[str] = None,
+                   mcts_players: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Play <num_games> games and return statistics about them.
+
+    Game i is played with the seed <seed> + i. If <workers> is greater than 1,
+    the games are played in a pool of that many processes; without MCTS
+    players, the results do not depend on the number of workers. If
+    <corpus_path> is given, the boards are read from that corpus instead of
+    being generated. <mcts_players>, if given, holds the search budget of each
+    MCTS player, in milliseconds.
+
+    Raise ValueError if the corpus holds no boards.
+    """
+    if corpus_path is not None:
+        # Check the corpus here, rather than failing in every worker.
+        _load_corpus(corpus_path)
+    jobs = [(seed + i, max_depth, num_turns, num_random, smart_players,
+             corpus_path, mcts_players)
+            for i in range(num_games)]
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_play_game, jobs,
+                                    chunksize=max(1, num_games //
+                                                  (workers * 4))))
+    else:
+        results = [_play_game(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+
+    players = []
+    all_times = []
+    for i, label in enumerate(lineup_labels(num_random, smart_players,
+                                            mcts_players)):
+        scores = [result['scores'][i] for result in results]
+        times = [t for result in results for t in result['think_times'][i]]
+        all_times.extend(times)
+        players.append({
+            'label': label,
+            'win_rate': sum(result['winner'] == i for result in results) /
+            max(1, num_games),
+            'score_mean': statistics.mean(scores) if scores else 0.0,
+            'score_stdev': statistics.pstdev(scores) if scores else 0.0,
+            'score_min': min(scores, default=0),
+            'score_max': max(scores, default=0),
+            'think_ms': _think_summary(times)
+        })
+
+    return {
+        'games': num_games,
+        'max_depth': max_depth,
+        'corpus': corpus_path,
+        'turns': num_turns,
+        'seed': seed,
+        'workers': workers,
+        'seconds': elapsed,
+        'games_per_second': num_games / elapsed if elapsed else 0.0,
+        'think_ms': _think_summary(all_times),
+        'players': players
+    }
+
+
+def _think_summary(times: Sequence[float]) -> Dict[str, float]:
+    """Return the 50th, 90th and 99th percentiles of <times>, converted from
+    seconds to milliseconds.
+    """
+    return {f'p{percent}': _percentile(times, percent) * 1000
+            for percent in (50, 90, 99)}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the statistics in <report>, as returned by run_tournament, in a
+    table.
+    """
+    if report['corpus'] is None:
+        boards = f"depth {report['max_depth']}"
+    else:
+        boards = f"boards from {report['corpus']}"
+    print(f"{report['games']} games on {boards}, "
+          f"{report['turns']} turns, seed {report['seed']}: "
+          f"{report['seconds']:.2f}s, "
+          f"{report['games_per_second']:.2f} games/s")
+    think = report['think_ms']
+    print(f"Think time: p50 {think['p50']:.2f}ms, p90 {think['p90']:.2f}ms, "
+          f"p99 {think['p99']:.2f}ms")
+    print(f"{'Player':<12}{'Wins':>8}{'Mean':>8}{'Stdev':>8}{'Min':>6}"
+          f"{'Max':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}")
+    for i, player in enumerate(report['players']):
+        think = player['think_ms']
+        print(f"{str(i) + ' ' + player['label']:<12}"
+              f"{player['win_rate']:>8.1%}{player['score_mean']:>8.2f}"
+              f"{player['score_stdev']:>8.2f}{player['score_min']:>6}"
+              f"{player['score_max']:>6}{think['p50']:>9.2f}"
+              f"{think['p90']:>9.2f}{think['p99']:>9.2f}")
+
+
+def main(argv: List[str] = None) -> None:
+    """Run a tournament configured by the command-line arguments <argv>.
+    """
+    parser = argparse.ArgumentParser(
+        description='Play headless Blocky games between AI players.')
+    parser.add_argument('--games', type=int, default=100,
+                        help='number of games to play')
+    parser.add_argument('--depth', type=int, default=3,
+                        help='maximum depth of each board')
+    parser.add_argument('--turns', type=int, default=5,
+                        help='number of turns in each game')
+    parser.add_argument('--random', type=int, default=1,
+                        help='number of random players')
+    parser.add_argument('--smart', type=int, nargs='*', default=[5],
+                        help='difficulty of each smart player')
+    parser.add_argument('--mcts', type=int, nargs='*', default=[],
+                        help='search budget of each MCTS player, in ms')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first game')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes to play games in')
+    parser.add_argument('--json', metavar='PATH',
+                        help='also write the statistics to this JSON file')
+    parser.add_argument('--corpus', metavar='PATH',
+                        help='read the boards from this corpus file')
+    args = parser.parse_args(argv)
+
+    if args.random + len(args.smart) + len(args.mcts) < 1:
+        parser.error('at least one player is needed')
+    if args.random + len(args.smart) + len(args.mcts) > len(COLOUR_LIST):
+        parser.error(f'at most {len(COLOUR_LIST)} players are allowed')
+
+    report = run_tournament(args.games, args.depth, args.turns, args.random,
+                            args.smart, args.seed, args.workers,
+                            args.corpus, args.mcts)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
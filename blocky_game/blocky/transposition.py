@@ -0,0 +1,95 @@
+"""
+This file contains TranspositionTable, a bounded cache of values computed for
+board positions, such as goal scores, keyed by a hash of the board.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TranspositionTable:
+    """A mapping from board keys to values that holds at most <capacity>
+    entries, evicting the least recently used entry when it is full.
+
+    Keys are usually Block.structure_hash() values, so that a position reached
+    by different sequences of moves is only evaluated once.
+
+    === Public Attributes ===
+    capacity:
+        The maximum number of entries kept in this table.
+    hits:
+        The number of calls to get() that found a value.
+    misses:
+        The number of calls to get() that did not find a value.
+
+    === Representation Invariants ===
+    - capacity >= 1
+    - len(_entries) <= capacity
+    """
+    # === Private Attributes ===
+    # _entries:
+    #   The entries of this table, from least to most recently used.
+    capacity: int
+    hits: int
+    misses: int
+    _entries: OrderedDict
+
+    def __init__(self, capacity: int = 100000) -> None:
+        """Initialize an empty table that holds at most <capacity> entries.
+
+        Precondition: capacity >= 1
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of entries in this table.
+        """
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value stored under <key>, or None if there is none.
+
+        >>> table = TranspositionTable(2)
+        >>> table.put(1, 'a')
+        >>> table.put(2, 'b')
+        >>> table.get(1)
+        'a'
+        >>> table.put(3, 'c')
+        >>> table.get(2) is None
+        True
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store <value> under <key>, evicting the least recently used entry
+        if this table is full.
+
+        Precondition: value is not None
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry from this table.
+        """
+        self._entries.clear()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'doctest', 'python_ta', 'typing', '__future__', 'collections'
+        ]
+    })